@@ -92,6 +92,24 @@ def app(request):
         database.drop_all()
 
 
+@pytest.fixture(scope="function")
+def db_session(app):
+    """
+    A database session joined to an external transaction, that is rolled back
+    at teardown. Lets tests modify the session-wide tables without recreating them.
+    """
+    connection = database.engine.connect()
+    transaction = connection.begin()
+    session = database.create_scoped_session(options={"bind": connection, "binds": {}})
+    default_session = database.session
+    database.session = session
+    yield session
+    database.session = default_session
+    session.remove()
+    transaction.rollback()
+    connection.close()
+
+
 @pytest.fixture(scope="function")
 def client(app):
     with app.test_client() as client:
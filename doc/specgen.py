@@ -35,11 +35,7 @@ def parse_args():
 
 
 def main(args):
-    config = {
-        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
-        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
-    }
-    app = create_app(config)
+    app = create_app({"APISPEC_ONLY": True})
     with app.app_context():
         with open(args.output, "w") as spec:
             spec.write(json.dumps(swagger.get_apispecs()))
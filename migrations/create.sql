@@ -1,5 +1,4 @@
 CREATE TABLE IF NOT EXISTS `sockpuppet`.`user` (
-        id INTEGER NOT NULL AUTO_INCREMENT,
         user_text VARCHAR(255) NOT NULL,
         is_anon BOOLEAN NOT NULL,
         num_edits INTEGER,
@@ -8,34 +7,31 @@ CREATE TABLE IF NOT EXISTS `sockpuppet`.`user` (
         oldest_edit DATETIME,
         insertion_time DATETIME DEFAULT (CURRENT_TIMESTAMP),
         dataset_id VARCHAR(36),
-        PRIMARY KEY (id),
+        PRIMARY KEY (user_text),
         CHECK (is_anon IN (0, 1))
 );
 
-CREATE INDEX `ix_user_user_text` ON `sockpuppet`.`user` (user_text);
-
-
 CREATE TABLE IF NOT EXISTS `sockpuppet`.`coedit` (
-        id INTEGER NOT NULL AUTO_INCREMENT,
         user_text VARCHAR(255) NOT NULL,
         user_text_neighbour VARCHAR(255) NOT NULL,
         overlap_count INTEGER NOT NULL,
         insertion_time DATETIME DEFAULT (CURRENT_TIMESTAMP),
         dataset_id VARCHAR(36),
-        PRIMARY KEY (id)
+        PRIMARY KEY (user_text, user_text_neighbour)
 );
 
-CREATE INDEX IF NOT EXISTS `ix_coedit_user_text` ON `sockpuppet`.`coedit` (user_text);
-
 CREATE TABLE IF NOT EXISTS `sockpuppet`.`temporal` (
-        id INTEGER NOT NULL AUTO_INCREMENT,
         user_text VARCHAR(255) NOT NULL,
         d TINYINT NOT NULL,
         h TINYINT NOT NULL,
         num_edits INTEGER NOT NULL,
         insertion_time DATETIME DEFAULT CURRENT_TIMESTAMP,
         dataset_id VARCHAR(36),
-        PRIMARY KEY (id)
+        PRIMARY KEY (user_text, d, h)
 );
 
-CREATE INDEX IF NOT EXISTS `service_ix_temporal_user_text` ON `sockpuppet`.`temporal` (user_text);
\ No newline at end of file
+CREATE TABLE IF NOT EXISTS `sockpuppet`.`dataset` (
+        dataset_id VARCHAR(36) NOT NULL,
+        insertion_time DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        PRIMARY KEY (dataset_id)
+);
\ No newline at end of file
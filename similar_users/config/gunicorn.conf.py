@@ -0,0 +1,53 @@
+# gunicorn settings for the similarusers service.
+# Usage: gunicorn -c similar_users/config/gunicorn.conf.py "similar_users.wsgi:configure_app()"
+#
+# Requests mix CPU bound work (similarity computations) with blocking MediaWiki API
+# calls: run one process per core, each serving requests from a pool of threads.
+#
+# Every worker process loads its own application. Requests keep the data they update
+# to themselves: the only state threads share are per-worker caches of rows read from
+# the database (`fetch_user`), never written by requests. Their entries expire after
+# CACHE_TTL, and are cleared once a database refresh is committed
+# (`check_dataset_version`): workers answer consistently as long as
+# SQLALCHEMY_DATABASE_URI points to a shared database.
+#
+# SQLite databases are served from a single connection (a StaticPool, with the default
+# in memory database), which the threads of a worker would share: unless
+# SQLALCHEMY_DATABASE_URI names a MySQL or PostgreSQL database, workers run a single
+# thread. Their engines pool up to 8 connections, one per thread by default.
+#
+# Each worker loads RESOURCE_PATH, when set, at startup (`configure_app`). With the
+# default in memory SQLite database (development), each worker loads its own copy.
+# Any other database is shared by the workers, which would all replace the same tables
+# at once: it is loaded by a single worker.
+import multiprocessing
+import os
+
+import yaml
+
+
+def _read_database_uri():
+    """SQLALCHEMY_DATABASE_URI, as `configure_app` reads it: an environment variable
+    overrides the CONFIG_PATH file."""
+    if "SQLALCHEMY_DATABASE_URI" in os.environ:
+        return os.environ["SQLALCHEMY_DATABASE_URI"]
+    config_path = os.environ.get("CONFIG_PATH")
+    if config_path:
+        with open(config_path) as config_f:
+            return (yaml.safe_load(config_f) or {}).get("SQLALCHEMY_DATABASE_URI") or ""
+    return ""
+
+
+_database_uri = _read_database_uri()
+_shared_database = _database_uri.startswith(("mysql", "postgresql"))
+# Unset, `create_app` defaults to an in memory SQLite database.
+_private_database = _database_uri in ("", "sqlite://", "sqlite:///:memory:")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+if os.environ.get("RESOURCE_PATH") and not _private_database:
+    workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8 if _shared_database else 1))
+# Lookups of users with many new edits can issue a large number of API requests.
+timeout = 60
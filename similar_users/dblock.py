@@ -1,22 +1,24 @@
 from flask import current_app
 from contextlib import contextmanager
 from functools import wraps
+from sqlalchemy import text
 
 from .models import database
 
 app = current_app
 
 
-def release_mysql_lock(name):
-    status = database.session.execute(f"SELECT RELEASE_LOCK('{name}')").scalar()
+def release_mysql_lock(name, connection=None):
+    connection = connection or database.session
+    status = connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name}).scalar()
     if status == 1:
-        app.logger.debug(f'Released application lock `{name}`')
+        app.logger.debug('Released application lock `%s`', name)
     elif status == 0:
-        app.logger.debug(f'No application lock found with name `{name}`')
+        app.logger.debug('No application lock found with name `%s`', name)
     else:
         # Could not explicitly release the application lock. Rely on implicit termination
         # once session ends
-        app.logger.debug(f'Failed to release application lock `{name}`')
+        app.logger.debug('Failed to release application lock `%s`', name)
 
 
 @contextmanager
@@ -26,26 +28,34 @@ def mysql_lock(name, timeout=3, retry=0):
     db access (e.g. batch periodic updates).
     It's orchestrated by acquiring a user lock on mysql.
 
+    User locks belong to the connection that acquired them. The lock is held by a
+    dedicated connection, pinned until it is released, rather than by the session's
+    connection, which is returned to the pool (and possibly swapped) at every commit.
+
     :param name: lock name
-    :param timeout: waiting time (in seconds) between retries
+    :param timeout: waiting time (in seconds) between retries, or `None` to wait indefinitely
     :param retry: number of attempts to acquire a lock
     :return:
     """
     resource = None
     tries = max(0, retry - 1)
-    while not resource and tries >= 0:
-        app.logger.debug(f'Attempting to acquire application lock `{name}`. Waiting for `{timeout}` seconds.'
-                         f'`{tries}` re-tries left.')
-        resource = database.session.execute(
-        f"SELECT GET_LOCK('{name}', {timeout})").scalar()
-        tries -= 1
-    else:
-        if resource:
-            app.logger.debug(f'Acquired application lock `{name}`.')
-            yield resource
-            release_mysql_lock(name=name)
+    with database.engine.connect() as connection:
+        while not resource and tries >= 0:
+            app.logger.debug('Attempting to acquire application lock `%s`. Waiting for `%s` seconds.'
+                             '`%s` re-tries left.', name, timeout, tries)
+            resource = connection.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": name, "timeout": -1 if timeout is None else timeout}).scalar()
+            tries -= 1
         else:
-            raise RuntimeError(f"Could not acquire application lock `{name}`.")
+            if resource:
+                app.logger.debug('Acquired application lock `%s`.', name)
+                try:
+                    yield resource
+                finally:
+                    release_mysql_lock(name=name, connection=connection)
+            else:
+                raise RuntimeError(f"Could not acquire application lock `{name}`.")
 
 
 def is_used_lock(name='lock_ingestion'):
@@ -53,13 +63,31 @@ def is_used_lock(name='lock_ingestion'):
     rdbms = database.session.bind.dialect.name
     if rdbms == "mysql":
         is_used = bool(database.session.execute(
-            f"SELECT IS_USED_LOCK('{name}')").scalar())
+            text("SELECT IS_USED_LOCK(:name)"), {"name": name}).scalar())
     else:
-        app.logger.warning(f'Failed to test for application lock. '
-                           f'The IS_USED_LOCK function is not available on {rdbms}.')
+        app.logger.warning('Failed to test for application lock. '
+                           'The IS_USED_LOCK function is not available on %s.', rdbms)
     return is_used
 
 
+@contextmanager
+def table_lock(table, timeout=10, retry=0):
+    """
+    Hold a `lock_ingestion_<table>` user lock on MySQL, while `table` is being written.
+    Writers of distinct tables, e.g. concurrent ingestion workers, don't contend with each other.
+
+    :param table: table name
+    :param timeout: waiting time (in seconds) between retries
+    :param retry: number of attempts to acquire a lock
+    :return:
+    """
+    if database.session.bind.dialect.name == "mysql":
+        with mysql_lock(f"lock_ingestion_{table}", timeout, retry) as lock:
+            yield lock
+    else:
+        yield None
+
+
 def application_lock(func, name="lock_ingestion", timeout=10, retry=0):
     """
     :param name: lock name
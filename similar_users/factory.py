@@ -1,5 +1,19 @@
+import sqlite3
+
 from json import JSONEncoder
-from flask import Flask
+from flask import Flask, current_app
+from flask import jsonify as flask_jsonify
+from sqlalchemy import event
+from sqlalchemy.engine.url import make_url
+
+try:
+    import orjson
+except ImportError:
+    # Encode responses with the (slower) json module.
+    orjson = None
+
+# Used by Flask-SQLAlchemy when SQLALCHEMY_DATABASE_URI is not set.
+DEFAULT_DATABASE_URI = "sqlite:///:memory:"
 
 
 class BinaryJSONEncoder(JSONEncoder):
@@ -7,14 +21,96 @@ class BinaryJSONEncoder(JSONEncoder):
     A custom JSONEncoder that handles encoding
     of binary objects.
 
+    When available, documents are serialized by orjson, unless they
+    require an indentation other than 2 spaces. orjson always emits
+    compact, UTF-8 (non ASCII escaped) documents.
+
     Example:
         >>> data = {"key": b"binary_value"}
         >>> print(json.dumps(data, cls=BinaryJSONEncoder))
     """
     def default(self, obj):
-        if isinstance(obj, bytes):
+        if isinstance(obj, (bytes, bytearray)):
             return obj.decode("utf-8")
-        return JSONEncoder.default(obj)
+        return super().default(obj)
+
+    def encode(self, obj):
+        if orjson is None or self.indent not in (None, 2):
+            return super().encode(obj)
+        return self.dumps(obj, sort_keys=self.sort_keys, indent=self.indent).decode("utf-8")
+
+    def dumps(self, obj, sort_keys=False, indent=None):
+        """
+        Serialize `obj` with orjson.
+
+        :param sort_keys: whether to sort the keys of objects
+        :param indent: None, or 2
+        :return: a UTF-8 encoded document, as bytes
+        """
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+
+def jsonify(*args, **kwargs):
+    """
+    A drop-in replacement for `flask.jsonify()`.
+
+    When the application encodes documents with BinaryJSONEncoder, and orjson is
+    available, the response body is serialized straight to bytes: skipping the
+    round trip through a str, that the response would encode again.
+    """
+    if orjson is None or current_app.json_encoder is not BinaryJSONEncoder:
+        return flask_jsonify(*args, **kwargs)
+    if args and kwargs:
+        raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+    data = args[0] if len(args) == 1 else args or kwargs
+    # Same formatting as flask.jsonify()
+    indent = 2 if current_app.config["JSONIFY_PRETTYPRINT_REGULAR"] or current_app.debug else None
+    body = BinaryJSONEncoder().dumps(data, sort_keys=current_app.config["JSON_SORT_KEYS"], indent=indent)
+    return current_app.response_class(body + b"\n", mimetype=current_app.config["JSONIFY_MIMETYPE"])
+
+
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """
+    Trade durability for write throughput on SQLite (development) databases:
+    use a write-ahead log, and don't fsync at every commit.
+
+    Registered by `create_app` on the application's engine only, when it is a SQLite one.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-262144")  # 256MiB
+        cursor.close()
+
+
+def engine_options(database_uri):
+    """
+    Dialect specific SQLAlchemy engine options.
+
+    :param database_uri: an RFC1738 database uri
+    :return: a dict of `create_engine()` keyword arguments
+    """
+    options = {}
+    backend = make_url(database_uri).get_backend_name()
+    if backend in ("mysql", "postgresql"):
+        # SQLite uses a single connection (in memory) or no pool at all (file databases).
+        # Test connections on checkout: idle ones may have been closed by the server.
+        options.update(pool_size=8, pool_pre_ping=True)
+    if backend == "postgresql":
+        # Let psycopg2 render executemany() INSERTs as multi-row VALUES statements,
+        # and batch other statements with execute_batch(). PyMySQL already does
+        # the former natively.
+        options.update(executemany_mode="values",
+                       executemany_values_page_size=10_000,
+                       executemany_batch_page_size=500)
+    return options
 
 
 def create_app(config=None):
@@ -23,20 +119,30 @@ def create_app(config=None):
     the Application Factories pattern
     https://flask.palletsprojects.com/en/1.1.x/patterns/appfactories/
 
-    :param config: a dict of Flask configuration options
+    :param config: a dict of Flask configuration options. When `APISPEC_ONLY` is set,
+        only the extensions needed to generate the OpenAPI spec are registered.
     :return: a Flask application
     """
     app = Flask(__name__)
 
     if config:
         app.config.update(config)
+    database_uri = app.config.get("SQLALCHEMY_DATABASE_URI") or DEFAULT_DATABASE_URI
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(database_uri))
 
     from .wsgi import api
     from .wsgi import metrics, cors, basic_auth, database, swagger
 
+    extensions = (metrics, cors, basic_auth, database, swagger)
+    if app.config.get("APISPEC_ONLY"):
+        # Generating the OpenAPI spec only requires the swagger extension and the api blueprint.
+        extensions = (swagger,)
+
     with app.app_context():
-        for extension in (metrics, cors, basic_auth, database, swagger):
+        for extension in extensions:
             extension.init_app(app=app)
+        if database in extensions and make_url(database_uri).get_backend_name() == "sqlite":
+            event.listen(database.get_engine(app), "connect", set_sqlite_pragma)
 
         app.register_blueprint(api)
         # jsonify() responses will be encoded with BinaryJSONEncoder.
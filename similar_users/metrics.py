@@ -1,4 +1,4 @@
-from time import perf_counter
+from time import perf_counter_ns
 
 
 class ExecutionTime:
@@ -11,15 +11,26 @@ class ExecutionTime:
     >>>     pass
     >>> print(timer.elapsed)
     """
+    __slots__ = ("start", "stop", "elapsed_ns")
+
     def __init__(self):
-        self.elapsed = None
+        self.elapsed_ns = None
 
     def __enter__(self):
-        self.start = perf_counter()
+        self.start = perf_counter_ns()
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
         if exc_type:
             return False
-        self.stop = perf_counter()
-        self.elapsed = self.stop - self.start
+        self.stop = perf_counter_ns()
+        self.elapsed_ns = self.stop - self.start
+
+    @property
+    def elapsed(self):
+        """
+        :return: the execution time in seconds, or None if the block did not complete
+        """
+        if self.elapsed_ns is None:
+            return None
+        return self.elapsed_ns / 1e9
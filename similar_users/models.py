@@ -6,9 +6,15 @@ in development.
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from sqlalchemy.sql import func
 
-database = SQLAlchemy()
+# Loaded objects are only read: don't expire (and reload) their attributes after a commit.
+database = SQLAlchemy(session_options={"expire_on_commit": False})
+
+# `dataset_id` columns are not indexed: no query filters on them. Refreshes (see
+# migrations/ingest.py) replace whole tables, or swap in a copy, rather than select
+# rows by dataset.
 
 
 class UserMetadata(database.Model):
@@ -16,8 +22,7 @@ class UserMetadata(database.Model):
     Represents attributes for users in Coedit.
     """
     __tablename__ = "user"
-    id = database.Column(database.Integer, primary_key=True)
-    user_text = database.Column(database.String)
+    user_text = database.Column(database.String, primary_key=True)
     is_anon = database.Column(database.Boolean)
     num_edits = database.Column(database.Integer)
     num_pages = database.Column(database.Integer)
@@ -31,11 +36,14 @@ class Coedit(database.Model):
     """
     Represents a (user, user) similarity matrix in terms of number
     of edits in which two users overlapped.
+
+    Rows are clustered by user: lookups of a user's neighbours read a range of the primary key.
+    PostgreSQL does not cluster tables by primary key: there, a covering index lets these
+    lookups be answered from the index alone, without fetching each row from the table.
     """
     __tablename__ = "coedit"
-    id = database.Column(database.Integer, primary_key=True)
-    user_text = database.Column(database.String)
-    user_text_neighbour = database.Column(database.String)
+    user_text = database.Column(database.String, primary_key=True)
+    user_text_neighbour = database.Column(database.String, primary_key=True)
     overlap_count = database.Column(database.Integer)
     insertion_time = database.Column(database.DateTime, server_default=func.current_timestamp())
     dataset_id = database.Column(database.String)
@@ -47,10 +55,31 @@ class Temporal(database.Model):
     edits occur.
     """
     __tablename__ = "temporal"
-    id = database.Column(database.Integer, primary_key=True)
-    user_text = database.Column(database.String)
-    d = database.Column(database.Integer)
-    h = database.Column(database.Integer)
+    user_text = database.Column(database.String, primary_key=True)
+    d = database.Column(database.Integer, primary_key=True, autoincrement=False)
+    h = database.Column(database.Integer, primary_key=True, autoincrement=False)
     num_edits = database.Column(database.Integer)
     insertion_time = database.Column(database.DateTime, server_default=func.current_timestamp())
     dataset_id = database.Column(database.String)
+
+
+class Dataset(database.Model):
+    """
+    Represents the dataset loaded in the database: its single row is replaced once all
+    the tables of a dataset are loaded.
+    """
+    __tablename__ = "dataset"
+    dataset_id = database.Column(database.String, primary_key=True)
+    insertion_time = database.Column(database.DateTime, server_default=func.current_timestamp())
+
+
+# SQLAlchemy 1.3 has no Index(postgresql_include=...): INCLUDE requires PostgreSQL 11.
+create_coedit_covering_index = DDL(
+    "CREATE INDEX IF NOT EXISTS ix_coedit_user_text_cover "
+    "ON %(table)s (user_text) INCLUDE (user_text_neighbour, overlap_count)"
+).execute_if(dialect="postgresql")
+# Bulk loads drop the index, and create it again once the rows are inserted.
+drop_coedit_covering_index = DDL(
+    "DROP INDEX IF EXISTS ix_coedit_user_text_cover"
+).execute_if(dialect="postgresql")
+event.listen(Coedit.__table__, "after_create", create_coedit_covering_index)
@@ -1,18 +1,31 @@
 from datetime import datetime, timedelta
 from ast import literal_eval as make_tuple
 import argparse
-import distutils.util
+import csv
 import logging
 import os
 import pathlib
+import sys
+import threading
 import time
+import uuid
+
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+from urllib.parse import quote
 
 import mwapi
+import numpy as np
 import yaml
 
+from cachetools import TTLCache, cached
 from flask import (
+    g,
     request,
-    jsonify,
     render_template,
     Blueprint,
     current_app,
@@ -22,13 +35,30 @@ from flask_cors import CORS
 from flasgger import Swagger
 from prometheus_flask_exporter import PrometheusMetrics
 from requests.adapters import HTTPAdapter
+from sqlalchemy import Integer, String, bindparam, cast, null, select, union_all
+from sqlalchemy.exc import SQLAlchemyError
 from requests.packages.urllib3.util.retry import Retry
-from sklearn.metrics.pairwise import cosine_similarity
-from .models import database, UserMetadata, Coedit, Temporal
-from .factory import create_app
+from .models import (
+    database,
+    Dataset,
+    UserMetadata,
+    Coedit,
+    Temporal,
+    create_coedit_covering_index,
+    drop_coedit_covering_index,
+)
+from .factory import create_app, jsonify
 from .dblock import is_used_lock as db_refresh_in_progress
 from .metrics import ExecutionTime
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    # Parse input data one line at a time.
+    pa = pc = pacsv = None
+
 # We need a Blueprint to delegate extensions initialisation
 # to a create_app() factory method. `current_app` is a proxy,
 # that points to the application handling the current activity.
@@ -47,21 +77,239 @@ swagger = Swagger(decorators=[basic_auth.required])
 # Local: http://127.0.0.1:5000/similarusers?usertext=Ziyingjiang
 # VPS: https://spd-test.wmcloud.org/similarusers?usertext=Bttowadch&k=50
 
-# Data dictionaries -- TODO: move to sqllitedict or something equivalent
-# Currently used for both READ and WRITE though
-USER_METADATA = {}  # is_anon; num_edits; num_pages; most_recent_edit; oldest_edit
-COEDIT_DATA = {}
-TEMPORAL_DATA = {}
+
+class SynchronizedTTLCache(TTLCache):
+    """A TTLCache that can be shared by request threads.
+
+    Reads reorder, and writes evict, entries: all of them are serialized by a lock.
+    """
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return super().get(key, default)
+
+
+class TemporalStore:
+    """Days-of-week ("d") and hours-of-the-day ("h") edit counts of users.
+
+    Counts are stored as rows of one (users, 7) and one (users, 24) matrix, together with
+    their L2-normalised copies. Rows that changed are normalised again, all at once, on the
+    next read. Row 0 is never assigned: it stands for users without data, with zero vectors.
+
+    At most `maxsize` users are kept: the least recently reset user is evicted, and its
+    row reused, to make room for a new one.
+    """
+    def __init__(self, maxsize, capacity=1024):
+        self.maxsize = maxsize
+        self._index = OrderedDict()  # user_text -> row
+        self._counts = {k: np.zeros((capacity, n)) for k, n in TEMPORAL_DIMENSIONS.items()}
+        self._vectors = {k: np.zeros((capacity, n)) for k, n in TEMPORAL_DIMENSIONS.items()}
+        self._dirty = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, 0, -1))
+        self._lock = threading.RLock()
+
+    def __contains__(self, user_text):
+        return user_text in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def _grow(self):
+        capacity = len(self._dirty)
+        for data in (self._counts, self._vectors):
+            for k, matrix in data.items():
+                data[k] = np.concatenate([matrix, np.zeros_like(matrix)])
+        self._dirty = np.concatenate([self._dirty, np.zeros(capacity, dtype=bool)])
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def reset(self, user_text):
+        """Set the counts of a user to zero, adding the user if needed."""
+        with self._lock:
+            row = self._index.get(user_text)
+            if row is None:
+                if len(self._index) >= self.maxsize:
+                    _, row = self._index.popitem(last=False)
+                else:
+                    if not self._free:
+                        self._grow()
+                    row = self._free.pop()
+            self._index[user_text] = row
+            self._index.move_to_end(user_text)
+            for k in TEMPORAL_DIMENSIONS:
+                self._counts[k][row] = 0
+            self._dirty[row] = True
+
+    def add(self, user_text, day_counts, hour_counts):
+        """Add to the counts of a user, adding the user if needed."""
+        with self._lock:
+            if user_text not in self._index:
+                self.reset(user_text)
+            row = self._index[user_text]
+            self._counts["d"][row] += day_counts
+            self._counts["h"][row] += hour_counts
+            self._dirty[row] = True
+
+    def set(self, user_text, day_counts, hour_counts):
+        """Replace the counts of a user, adding the user if needed: readers never see them reset."""
+        with self._lock:
+            self.reset(user_text)
+            self.add(user_text, day_counts, hour_counts)
+
+    def has_edits(self, user_text):
+        """Whether a user is known, and has edits."""
+        with self._lock:
+            row = self._index.get(user_text, 0)
+            # Every edit is counted in both dimensions.
+            return bool(row) and self._counts["d"][row].any()
+
+    def counts(self, user_text, k):
+        """The `k` counts of a user, as a list."""
+        # Look the row up and read it at once: `reset` can hand the row of an evicted user to another.
+        with self._lock:
+            return self._counts[k][self._index.get(user_text, 0)].tolist()
+
+    def _normalise(self):
+        dirty = np.flatnonzero(self._dirty)
+        if dirty.size:
+            for k, counts in self._counts.items():
+                rows = counts[dirty]
+                norms = np.linalg.norm(rows, axis=1, keepdims=True)
+                # zero vectors stay zero
+                self._vectors[k][dirty] = np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+            self._dirty[dirty] = False
+
+    def vector(self, user_text, k):
+        """The L2-normalised `k` vector of a user, a zero vector if the user is unknown."""
+        with self._lock:
+            row = self._index.get(user_text)
+            if row is None:
+                return ZERO_VECTORS[k]
+            self._normalise()
+            return self._vectors[k][row].copy()
+
+    def vectors(self, users, k):
+        """The L2-normalised `k` vectors of `users`, as rows of a matrix."""
+        with self._lock:
+            self._normalise()
+            return self._vectors[k][[self._index.get(user_text, 0) for user_text in users]]
+
+    def clear(self):
+        with self._lock:
+            rows = list(self._index.values())
+            for k in TEMPORAL_DIMENSIONS:
+                self._counts[k][rows] = 0
+                self._vectors[k][rows] = 0
+            self._dirty[rows] = False
+            self._free.extend(rows)
+            self._index.clear()
+
+
+# Maximum number of users, and time in seconds, data dictionaries keep users for.
+CACHE_MAXSIZE = 50_000
+CACHE_TTL = 3600
+# Seconds between checks of the dataset loaded in the database (see `check_dataset_version`).
+DATASET_CHECK_INTERVAL = 60
+# Length of the days-of-week ("d") and hours-of-the-day ("h") vectors in TEMPORAL_DATA.
+TEMPORAL_DIMENSIONS = {"d": 7, "h": 24}
+# Shared (read only) vectors of users without temporal data.
+ZERO_VECTORS = {k: np.zeros(n) for k, n in TEMPORAL_DIMENSIONS.items()}
+for _zeros in ZERO_VECTORS.values():
+    _zeros.setflags(write=False)
+
+# Read only caches of the database data of the users looked up recently: requests copy
+# the data of their user, and only read the data of the neighbours.
+# user_text -> LookupResult (see `fetch_user`)
+LOOKUP_CACHE = SynchronizedTTLCache(CACHE_MAXSIZE, CACHE_TTL)
+# Temporal vectors of the users in LOOKUP_CACHE, set by `lookup_user`.
+TEMPORAL_DATA = TemporalStore(CACHE_MAXSIZE)
+# Identifier of the dataset the caches were filled from, and when it was last checked.
+DATASET_VERSION = {"version": None, "checked": None}
+DATASET_VERSION_LOCK = threading.Lock()
+# Metadata of users with edits in scope, but not in the dataset (is_anon is not used in responses).
+NEW_USER_METADATA = {"num_edits": 0, "num_pages": 0, "most_recent_edit": None, "oldest_edit": None}
+# Cleared while RESOURCE_PATH is loaded in the background (see `configure_app`):
+# /similarusers answers 503 until the data is ready.
+DATA_READY = threading.Event()
+DATA_READY.set()
 
 # TODO: Make all of these configuration options
 DEFAULT_K = 50
 TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 READABLE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+# Boolean literals of the input data, as `distutils.util.strtobool` accepted them, in lower,
+# title or upper case: matched as is by `strtobool`, pyarrow's CSV reader, and migrations/ingest.py.
+TRUE_VALUES = list(dict.fromkeys(
+    case(word) for word in ("y", "yes", "t", "true", "on", "1") for case in (str.lower, str.title, str.upper)
+))
+FALSE_VALUES = list(dict.fromkeys(
+    case(word) for word in ("n", "no", "f", "false", "off", "0") for case in (str.lower, str.title, str.upper)
+))
+BOOLEAN_VALUES = {**dict.fromkeys(TRUE_VALUES, True), **dict.fromkeys(FALSE_VALUES, False)}
 URL_PREFIX = "https://spd-test.wmcloud.org/similarusers"
 EDITORINTERACT_URL = "https://sigma.toolforge.org/editorinteract.py?users={0}&users={1}&users=&startdate=&enddate=&ns=&server=enwiki&allusers=on"
 INTERACTIONTIMELINE_URL = (
     "https://interaction-timeline.toolforge.org/?wiki=enwiki&user={0}&user={1}"
 )
+# Number of rows inserted at a time when loading RESOURCE_PATH.
+LOAD_BATCH_SIZE = 10_000
+# Number of threads issuing MediaWiki API requests concurrently.
+MWAPI_WORKERS = 8
+
+# MediaWiki API requests are I/O bound: issue them concurrently from a pool of threads,
+# each with its own mwapi sessions (requests sessions are not thread safe).
+mwapi_executor = ThreadPoolExecutor(max_workers=MWAPI_WORKERS, thread_name_prefix="mwapi")
+mwapi_sessions = threading.local()
+
+
+@api.before_request
+def check_data_ready():
+    """Don't query users while the input data is being loaded."""
+    if request.endpoint == "api.get_similar_users" and not DATA_READY.is_set():
+        return jsonify({"status": "loading"}), 503
+
+
+@api.before_request
+def check_dataset_version():
+    """Don't answer from the users cached before a database refresh.
+
+    Refreshes (see migrations/ingest.py) record their dataset_id in a final commit, once
+    all the tables are loaded: every worker then clears its caches within
+    DATASET_CHECK_INTERVAL seconds."""
+    if request.endpoint != "api.get_similar_users":
+        return
+    with DATASET_VERSION_LOCK:
+        now = time.monotonic()
+        checked = DATASET_VERSION["checked"]
+        if checked is not None and now - checked < DATASET_CHECK_INTERVAL:
+            return
+        try:
+            version = dataset_version()
+        except SQLAlchemyError as e:
+            # e.g. databases created before the dataset table: keep the caches until their TTL.
+            database.session.rollback()
+            app.logger.warning("Failed to read the dataset version: %s", e)
+            version = DATASET_VERSION["version"]
+        if checked is not None and version != DATASET_VERSION["version"]:
+            app.logger.info(
+                "Dataset changed from %s to %s: clearing cached users", DATASET_VERSION["version"], version
+            )
+            clear_caches()
+        DATASET_VERSION.update(version=version, checked=now)
 
 
 @api.route("/")
@@ -89,11 +337,8 @@ def index():
 @metrics.counter(
     "similar_users",
     "Number of calls to similarusers",
-    labels={
-        "similar_count": lambda r: len(r.get_json()["results"])
-        if r.get_json() and "results" in r.get_json()
-        else 0
-    },
+    # Set by get_similar_users(), rather than parsed back from the response.
+    labels={"similar_count": lambda r: g.get("similar_count", 0)},
 )
 def get_similar_users(lang="en"):
     """Similar Users GET endpoint
@@ -198,7 +443,7 @@ def get_similar_users(lang="en"):
     if error is not None:
         app.logger.error("Got error when trying to validate API arguments: %s", error["Error"])
         return jsonify(error)
-    app.logger.debug(f"Finished validating API arguments in {timer.elapsed:0.4f} seconds")
+    app.logger.debug("Finished validating API arguments in %0.4f seconds", timer.elapsed)
 
     # Test is the model dataset is being refreshed, and abort the request if so.a
     # We assume that refreshes are sporadic events; The refresh process won't be notified
@@ -206,13 +451,13 @@ def get_similar_users(lang="en"):
     # is only eventually guaranteed.
     # A database refresh can potentially start while executing this block.
 
-    app.logger.debug(f"Starting database lookup")
+    app.logger.debug("Starting database lookup")
     with ExecutionTime() as timer:
         if not db_refresh_in_progress():
             try:
-                lookup_user(user_text)
+                user = lookup_user(user_text)
             except Exception as e:
-                app.logger.error(f"Unable to load data for user {user_text}: {e}")
+                app.logger.error("Unable to load data for user %s: %s", user_text, e)
                 return jsonify({"Error": e})
             app.logger.debug("Finished user lookup")
         else:
@@ -221,14 +466,21 @@ def get_similar_users(lang="en"):
                 "Error": "Database refresh in progress",
                 "error-type": "database-refresh"
             }), 403
-    app.logger.debug(f"Finished database lookup in {timer.elapsed:0.4f} seconds")
+    app.logger.debug("Finished database lookup in %0.4f seconds", timer.elapsed)
+
+    # The data of the user is updated with their latest edits by this request only.
+    metadata = dict(user.metadata) if user.metadata is not None else dict(NEW_USER_METADATA)
+    temporal = {"d": user.temporal_d.copy(), "h": user.temporal_h.copy()}
+    overlapping_users = list(user.coedits)
 
     app.logger.debug("Starting to get additional edits")
     with ExecutionTime() as timer:
         try:
             edits = get_additional_edits(
                 user_text,
-                last_edit_timestamp=USER_METADATA[user_text]["most_recent_edit"],
+                metadata,
+                temporal,
+                last_edit_timestamp=metadata["most_recent_edit"],
                 limit=app.config["MAX_PAGES_PER_LOOKUP"]
             )
         except Exception as exc:
@@ -238,28 +490,28 @@ def get_similar_users(lang="en"):
             return jsonify(
                 {"Error": f"Failed to get additional edits for user {user_text}"}
             )
-    app.logger.debug(f"Finished getting additional edits in {timer.elapsed:0.4f} seconds")
+    app.logger.debug("Finished getting additional edits in %0.4f seconds", timer.elapsed)
 
     app.logger.debug("Got %d edits for user %s", len(edits) if edits else 0, user_text)
     if edits is not None:
         app.logger.debug("Started getting coedit data")
         with ExecutionTime() as timer:
-            update_coedit_data(user_text, edits, app.config["EDIT_WINDOW"])
-        app.logger.debug(f"Finished getting coedit data in {timer.elapsed:0.4f} seconds")
-    overlapping_users = COEDIT_DATA.get(user_text, [])[:num_similar]
+            overlapping_users = update_coedit_data(user_text, overlapping_users, edits, app.config["EDIT_WINDOW"])
+        app.logger.debug("Finished getting coedit data in %0.4f seconds", timer.elapsed)
+    overlapping_users = overlapping_users[:num_similar]
 
     oldest_edit = None
     last_edit = None
-    app.logger.info(str(USER_METADATA[user_text]))
-    if USER_METADATA[user_text]["oldest_edit"]:
-        oldest_edit = USER_METADATA[user_text]["oldest_edit"].strftime(
+    app.logger.info("%s", metadata)
+    if metadata["oldest_edit"]:
+        oldest_edit = metadata["oldest_edit"].strftime(
             READABLE_TIME_FORMAT
         )
     else:
         app.logger.debug("Didn't get an oldest_edit for user %s", user_text)
 
-    if USER_METADATA[user_text]["most_recent_edit"]:
-        last_edit = USER_METADATA[user_text]["most_recent_edit"].strftime(
+    if metadata["most_recent_edit"]:
+        last_edit = metadata["most_recent_edit"].strftime(
             READABLE_TIME_FORMAT
         )
     else:
@@ -269,20 +521,18 @@ def get_similar_users(lang="en"):
     with ExecutionTime() as timer:
         result = {
             "user_text": user_text,
-            "num_edits_in_data": USER_METADATA[user_text]["num_edits"],
+            "num_edits_in_data": metadata["num_edits"],
             "first_edit_in_data": oldest_edit,
             "last_edit_in_data": last_edit,
-            "results": [
-                build_result(user_text, u[0], u[1], num_similar, followup)
-                for u in overlapping_users
-            ],
+            "results": build_results(user_text, overlapping_users, num_similar, followup, metadata, temporal),
         }
-    app.logger.debug(f"Finished creating get_similar_user result set in {timer.elapsed:0.4f} seconds")
+        g.similar_count = len(result["results"])
+    app.logger.debug("Finished creating get_similar_user result set in %0.4f seconds", timer.elapsed)
     app.logger.debug(
         "Got %d similarity results for user %s", len(result["results"]), user_text
     )
 
-    app.logger.debug("Returning result of {}".format(str(result)))
+    app.logger.debug("Returning result of %s", result)
     return jsonify(result)
 
 
@@ -354,10 +604,51 @@ def make_mwapi_session(lang, user_agent, retries, request_host=None):
     return session
 
 
-def build_result(user_text, neighbor, num_pages_overlapped, num_similar, followup):
+def get_mwapi_session(lang, user_agent, retries, request_host=None):
+    """Get a `make_mwapi_session` session, created once per thread and set of arguments.
+
+    Sessions keep their connections to the MediaWiki API alive: requests made by a thread
+    after the first one don't repeat the TCP and TLS handshakes."""
+    key = (lang, user_agent, retries, request_host)
+    sessions = getattr(mwapi_sessions, "sessions", None)
+    if sessions is None:
+        sessions = mwapi_sessions.sessions = {}
+    if key not in sessions:
+        sessions[key] = make_mwapi_session(lang, user_agent, retries, request_host)
+    return sessions[key]
+
+
+def cached_metadata(user_text):
+    """The metadata of a user looked up recently (see `fetch_user`), without querying the
+    database: empty if the user is not cached, or not in the dataset."""
+    result = LOOKUP_CACHE.get(user_text)
+    if result is None or result.metadata is None:
+        return {}
+    return result.metadata
+
+
+def build_result(user_text, neighbor, num_pages_overlapped, num_similar, followup, metadata=None, temporal=None):
     """Build a single similar-user API response"""
+    return build_results(
+        user_text, [(neighbor, num_pages_overlapped)], num_similar, followup, metadata, temporal
+    )[0]
 
 
+def build_results(user_text, overlapping_users, num_similar, followup, metadata=None, temporal=None):
+    """Build the similar-user API responses of a list of (neighbor, num_pages_overlapped).
+
+    Edit and temporal overlaps are computed for all neighbors at once, with numpy.
+    `metadata` and `temporal` are the data of the user, updated by the request (by default,
+    their cached data); neighbors' data are read from the caches.
+    """
+    if not overlapping_users:
+        return []
+    if metadata is None:
+        metadata = cached_metadata(user_text)
+    neighbors = [u[0] for u in overlapping_users]
+    num_pages_overlapped = np.array([u[1] for u in overlapping_users], dtype=np.float64)
+    neighbors_metadata = [cached_metadata(neighbor) for neighbor in neighbors]
+
     # Isaac, 2021-02-25: that cut-off enforcement is explicitly  in the code for edit-overlap-inv because when
     # I use the APIs to update the edit overlap info,  I don't update the num_pages data for the neighbor
     # (otherwise their num_pages info would reflect a mixed state where we have some but not all of their edits but
@@ -365,44 +656,60 @@ def build_result(user_text, neighbor, num_pages_overlapped, num_similar, followu
     # it can look like editors had more overlapping pages than they edited, which is non-sensical.
     # it's a small compromise in accuracy but the alternative would introduce a lot more latency.
     # this isn't the case for edit-overlap so i don't have to enforce the min(1, edit-overlap) component.
-    r = {
-        "user_text": neighbor,
-        "num_edits_in_data": USER_METADATA.get(neighbor, {}).get(
-            "num_pages", num_pages_overlapped
-        ),
-        "edit-overlap": num_pages_overlapped / USER_METADATA[user_text]["num_pages"],
-        "edit-overlap-inv": min(
-            1,
-            num_pages_overlapped / USER_METADATA.get(neighbor, {}).get("num_pages", 1),
-        ),
-        "day-overlap": get_temporal_overlap(user_text, neighbor, "d"),
-        "hour-overlap": get_temporal_overlap(user_text, neighbor, "h"),
-    }
+    # Divisions by zero raise, as they would with Python numbers.
+    with np.errstate(divide="raise", invalid="raise"):
+        edit_overlaps = num_pages_overlapped / metadata["num_pages"]
+        edit_overlaps_inv = num_pages_overlapped / np.array(
+            [metadata.get("num_pages", 1) for metadata in neighbors_metadata], dtype=np.float64
+        )
+
     if followup:
-        r["follow-up"] = {
-            "similar": "{0}?usertext={1}&k={2}".format(
-                URL_PREFIX, neighbor, num_similar
-            ),
-            "editorinteract": EDITORINTERACT_URL.format(user_text, neighbor),
-            "interaction-timeline": INTERACTIONTIMELINE_URL.format(user_text, neighbor),
+        # User names are URL encoded once, and shared by the follow-up links of all neighbors.
+        similar_url = f"{URL_PREFIX}?usertext={{0}}&k={num_similar}"
+        quoted_user_text = quote(user_text)
+
+    results = []
+    for neighbor, neighbor_metadata, n, edit_overlap, edit_overlap_inv, day_overlap, hour_overlap in zip(
+        neighbors,
+        neighbors_metadata,
+        (u[1] for u in overlapping_users),
+        edit_overlaps.tolist(),
+        edit_overlaps_inv.tolist(),
+        get_temporal_overlaps(user_text, neighbors, "d", temporal),
+        get_temporal_overlaps(user_text, neighbors, "h", temporal),
+    ):
+        r = {
+            "user_text": neighbor,
+            "num_edits_in_data": neighbor_metadata.get("num_pages", n),
+            "edit-overlap": edit_overlap,
+            # min(1, edit_overlap_inv)
+            "edit-overlap-inv": 1 if edit_overlap_inv >= 1 else edit_overlap_inv,
+            "day-overlap": day_overlap,
+            "hour-overlap": hour_overlap,
         }
-    return r
+        if followup:
+            quoted_neighbor = quote(neighbor)
+            r["follow-up"] = {
+                "similar": similar_url.format(quoted_neighbor),
+                "editorinteract": EDITORINTERACT_URL.format(quoted_user_text, quoted_neighbor),
+                "interaction-timeline": INTERACTIONTIMELINE_URL.format(quoted_user_text, quoted_neighbor),
+            }
+        results.append(r)
+    return results
 
 
 def get_temporal_overlap(u1, u2, k):
     """Determine how similar two users are in terms of days and hours in which they edit."""
-    # overlap in days-of-week
-    if k == "d":
-        cs = cosine_similarity(
-            [TEMPORAL_DATA.get(u1, {}).get("d", [0] * 7)],
-            [TEMPORAL_DATA.get(u2, {}).get("d", [0] * 7)],
-        )[0][0]
-    # overlap in hours-of-the-day
-    elif k == "h":
-        cs = cosine_similarity(
-            [TEMPORAL_DATA.get(u1, {}).get("h", [0] * 24)],
-            [TEMPORAL_DATA.get(u2, {}).get("h", [0] * 24)],
-        )[0][0]
+    # overlap in days-of-week ("d") or hours-of-the-day ("h")
+    if k in TEMPORAL_DIMENSIONS:
+        if not (TEMPORAL_DATA.has_edits(u1) and TEMPORAL_DATA.has_edits(u2)):
+            # e.g. new accounts: no overlap, whoever the other user is
+            cs = 0.0
+        elif u1 == u2:
+            cs = 1.0
+        else:
+            # Cosine similarity of (non negative) count vectors, in [0, 1].
+            cs = float(np.dot(TEMPORAL_DATA.vector(u1, k), TEMPORAL_DATA.vector(u2, k)))
     else:
         app.logger.error(
             "Unrecognised temporal overlap key - expected 'd' or 'h' but got %s", k
@@ -410,6 +717,36 @@ def get_temporal_overlap(u1, u2, k):
         raise Exception(
             "Do not recognize temporal overlap key -- must be 'd' for daily or 'h' for hourly."
         )
+    return label_temporal_overlap(cs)
+
+
+def get_temporal_overlaps(user_text, neighbors, k, temporal=None):
+    """Determine the temporal overlap of a user with each of `neighbors`, with a single
+    matrix-vector product rather than one dot product per neighbor.
+
+    `temporal` holds the day ("d") and hour ("h") counts of the user, by default their
+    counts in TEMPORAL_DATA."""
+    if not neighbors:
+        return []
+    if k not in TEMPORAL_DIMENSIONS:
+        return [get_temporal_overlap(user_text, neighbor, k) for neighbor in neighbors]
+    if temporal is None:
+        vector = TEMPORAL_DATA.vector(user_text, k)
+    else:
+        norm = np.linalg.norm(temporal[k])
+        vector = temporal[k] / norm if norm else ZERO_VECTORS[k]
+    if not vector.any():
+        # e.g. new accounts: no overlap, whoever the other user is
+        return [label_temporal_overlap(0.0) for _ in neighbors]
+    sims = TEMPORAL_DATA.vectors(neighbors, k) @ vector
+    return [
+        label_temporal_overlap(1.0 if neighbor == user_text else cs)
+        for neighbor, cs in zip(neighbors, sims.tolist())
+    ]
+
+
+def label_temporal_overlap(cs):
+    """Map a temporal overlap cosine similarity to a temporal overlap result."""
     # map cosine similarity values to qualitative labels
     # thresholds based on examining some examples and making judgments on how similar they seemed to be
     level = "No overlap"
@@ -427,9 +764,13 @@ def get_temporal_overlap(u1, u2, k):
 
 
 def get_additional_edits(
-    user_text, last_edit_timestamp=None, lang="en", limit=50, session=None
+    user_text, metadata, temporal, last_edit_timestamp=None, lang="en", limit=50, session=None
 ):
-    """Gather edits made by a user since last data dumps -- e.g., October edits if dumps end of September dumps used."""
+    """Gather edits made by a user since last data dumps -- e.g., October edits if dumps end of September dumps used.
+
+    The user's `metadata` and `temporal` ({"d": day counts, "h": hour counts}) data are
+    updated with these edits.
+    """
     if last_edit_timestamp:
         arvstart = last_edit_timestamp + timedelta(seconds=1)
     else:
@@ -437,7 +778,7 @@ def get_additional_edits(
         # based on current date or query it from a datastore.
         arvstart = app.config["MOST_RECENT_REV_TS"]
     if session is None:
-        session = make_mwapi_session(
+        session = get_mwapi_session(
             lang,
             app.config["CUSTOM_UA"],
             app.config["MWAPI_RETRIES"],
@@ -461,10 +802,11 @@ def get_additional_edits(
         formatversion=2,
         continuation=True,
     )
-    min_timestamp = USER_METADATA[user_text]["oldest_edit"]
-    max_timestamp = USER_METADATA[user_text]["most_recent_edit"]
+    min_timestamp = metadata["oldest_edit"]
+    max_timestamp = metadata["most_recent_edit"]
     new_edits = 0
     new_pages = 0
+    timestamps = []
     try:
         pageids = {}
         for r in result:
@@ -473,32 +815,34 @@ def get_additional_edits(
                 if pid not in pageids:
                     pageids[pid] = []
                     new_pages += 1
-                for rev in page["revisions"]:
-                    ts = rev["timestamp"]
-                    pageids[pid].append(ts)
-                    dtts = datetime.strptime(ts, TIME_FORMAT)
-                    # update TEMPORAL_DATA so future calls don't have to repeat this
-                    update_temporal_data(user_text, dtts.day, dtts.hour, 1)
-                    new_edits += 1
-                    if min_timestamp is None:
-                        min_timestamp = dtts
-                        max_timestamp = dtts
-                    else:
-                        max_timestamp = max(max_timestamp, dtts)
-                        min_timestamp = min(min_timestamp, dtts)
+                page_timestamps = [rev["timestamp"] for rev in page["revisions"]]
+                pageids[pid].extend(page_timestamps)
+                timestamps.extend(page_timestamps)
+                new_edits += len(page_timestamps)
                 # a little hacky to break out of nested for loop but necessary without moving loop to its own function
                 if new_pages >= limit:
                     break
             if new_pages >= limit:
                 break
-        # Update USER_METADATA so future calls don't need to repeat this process
-        app.logger.debug(f"Retrieved additional edits: user={user_text} num_edits={new_edits} "
-                         f"min_timestamp={min_timestamp} max_timestamp={max_timestamp}")
-        USER_METADATA[user_text]["num_edits"] += new_edits
+        if new_edits:
+            dtts = parse_timestamps(timestamps)
+            if min_timestamp is None:
+                min_timestamp = dtts.min().item()
+                max_timestamp = dtts.max().item()
+            else:
+                min_timestamp = min(min_timestamp, dtts.min().item())
+                max_timestamp = max(max_timestamp, dtts.max().item())
+            # days of week are numbered from 0, Sunday, as in the temporal dataset (1970-01-01 was a Thursday)
+            days = (dtts.astype("datetime64[D]").astype(np.int64) + 4) % 7
+            hours = dtts.astype(np.int64) // 3600 % 24
+            update_temporal_data_from_edits(temporal, days, hours)
+        app.logger.debug("Retrieved additional edits: user=%s num_edits=%s min_timestamp=%s max_timestamp=%s",
+                         user_text, new_edits, min_timestamp, max_timestamp)
+        metadata["num_edits"] += new_edits
         # this is not ideal as these might not be new pages but too expensive to check and getting it wrong isn't so bad
-        USER_METADATA[user_text]["num_pages"] += new_pages
-        USER_METADATA[user_text]["most_recent_edit"] = max_timestamp
-        USER_METADATA[user_text]["oldest_edit"] = min_timestamp
+        metadata["num_pages"] += new_pages
+        metadata["most_recent_edit"] = max_timestamp
+        metadata["oldest_edit"] = min_timestamp
         return pageids
     except Exception as exc:
         app.logger.error(
@@ -514,56 +858,68 @@ def get_additional_edits(
         return None
 
 
-def update_coedit_data(user_text, new_edits, k, lang="en", session=None, limit=250):
+def update_coedit_data(user_text, most_similar_users, new_edits, k, lang="en", session=None, limit=250):
     """Get all new edits since dump ended on pages the user edited and overlapping users.
 
+    :param most_similar_users: the (neighbor, overlap) list of the user
+    :return: the list updated with the new edits, sorted by overlap
+
     NOTE: this is potentially very high latency for pages w/ many edits or if the editor edited many pages
     TODO: come up with a sampling strategy -- e.g., cap at 50
     ALT TODO: only do first k -- e.g., 50 -- but rewrite how additional edits are stored so can ensure that the next API call
     will get the next 50 without missing data.
+
+    Pages revisions are requested concurrently, by `MWAPI_WORKERS` threads, each with its
+    own session. A `session`, when given, is not thread safe: requests are then sent one
+    at a time, from the calling thread.
     """
-    most_similar_users = COEDIT_DATA[user_text]
-    if session is None:
-        session = make_mwapi_session(
-            lang,
-            app.config["CUSTOM_UA"],
-            app.config["MWAPI_RETRIES"],
-            app.config["MWAPI_ORIGIN"],
-        )
+    session_args = (
+        lang,
+        app.config["CUSTOM_UA"],
+        app.config["MWAPI_RETRIES"],
+        app.config["MWAPI_ORIGIN"],
+    )
+    # TODO move this timestamp out of configuration - either automate it
+    # based on current date or query it from a datastore.
+    rvstart = app.config["MOST_RECENT_REV_TS"]
 
-    overlapping_users = {}
-    for pid in new_edits:
+    def get_revisions(pid):
         # generate list of all revisions since user's last recorded revision
         # (edits by hidden users will be filtered out)
-        result = session.get(
+        # Revisions ranges (rvstart, rvlimit) can only be queried one page at a time.
+        result = (session or get_mwapi_session(*session_args)).get(
             action="query",
             prop="revisions",
             pageids=pid,
             rvprop="ids|timestamp|user",
-            # TODO move this timestamp out of configuration - either automate it
-            # based on current date or query it from a datastore.
-            rvstart=app.config["MOST_RECENT_REV_TS"],
+            rvstart=rvstart,
             rvdir="newer",
             format="json",
             rvlimit=500,
             formatversion=2,
             continuation=True,
         )
+        # Continuation requests are sent while iterating over the results.
+        return list(result)
+
+    if session is None:
+        revisions = mwapi_executor.map(get_revisions, new_edits)
+    else:
+        revisions = map(get_revisions, new_edits)
+    overlapping_users = {}
+    # Results are processed in `new_edits` order, as they would be sequentially.
+    for pid, result in zip(new_edits, revisions):
         for r in result:
             revs = r["query"]["pages"][0].get("revisions", [])
-            user_edit_indices = [
-                i for i, e in enumerate(revs) if ("user" in e and e["user"] == user_text)
-            ]
-            for idx in user_edit_indices:
-                for e in revs[max(0, idx - k) : idx + k]:
-                    if "user" not in e or e["user"] == user_text:
-                        continue
-                    if e["user"] not in overlapping_users:
-                        overlapping_users[e["user"]] = set()
-                    overlapping_users[e["user"]].add(pid)
+            for u in get_window_users(revs, user_text, k):
+                if u not in overlapping_users:
+                    overlapping_users[intern_user_text(u)] = set()
+                overlapping_users[u].add(pid)
 
     # remove bots
-    new_users = [u for u in overlapping_users if u not in USER_METADATA]
+    if session is None:
+        session = get_mwapi_session(*session_args)
+    new_users = [u for u in overlapping_users if not cached_metadata(u)]
     for user_list in chunkify(new_users):
         result = session.get(
             action="query",
@@ -577,36 +933,87 @@ def update_coedit_data(user_text, new_edits, k, lang="en", session=None, limit=2
             if "bot" in u.get("groups", []):
                 overlapping_users.pop(u["name"])
 
-    # update overlap list
-    for i in range(len(most_similar_users) - 1, -1, -1):
-        ut = most_similar_users[i][0]
-        overlap = most_similar_users[i][1]
-        if ut in overlapping_users:
-            new_pages = overlapping_users.pop(ut)
-            overlap += len(new_pages)
-            most_similar_users[i] = (ut, overlap)
-    for u in overlapping_users:
-        most_similar_users.append((u, len(overlapping_users[u])))
-
-    # temporarily add in # of edits from neighbor for purpose of sorting and then remove for long-term storage
-    most_similar_users_sorted = [
-        (u[0], u[1], 0 - USER_METADATA.get(u[0], {}).get("num_pages", 0))
-        for u in most_similar_users
-    ]
-    most_similar_users_sorted = sorted(
-        most_similar_users_sorted, key=lambda x: (x[1], x[2]), reverse=True
+    # update overlap list: add new pages to existing neighbors, and append new neighbors
+    overlaps = dict(most_similar_users)
+    for ut, new_pages in overlapping_users.items():
+        overlaps[ut] = overlaps.get(ut, 0) + len(new_pages)
+    neighbors = list(overlaps)
+    num_overlaps = np.fromiter(overlaps.values(), dtype=np.int64, count=len(overlaps))
+
+    # past the first `limit` users (by overlap), drop the ones with a single overlapping page
+    cut_at = len(neighbors)
+    if cut_at > limit:
+        num_above = np.count_nonzero(num_overlaps > 1)
+        num_single = np.count_nonzero(num_overlaps == 1)
+        if num_above >= limit:
+            if num_single:
+                cut_at = num_above
+        elif num_above + num_single > limit:
+            cut_at = limit
+    # only users with at least the overlap of the last one kept need to be sorted
+    if 0 < cut_at < len(neighbors):
+        min_overlap = np.partition(num_overlaps, len(neighbors) - cut_at)[len(neighbors) - cut_at]
+        candidates = np.flatnonzero(num_overlaps >= min_overlap)
+    else:
+        candidates = np.arange(cut_at)
+
+    # sort by overlap (descending), then by # of edits from neighbor (ascending);
+    # lexsort is stable, and uses the last key as the primary one
+    num_pages = np.fromiter(
+        (cached_metadata(neighbors[i]).get("num_pages", 0) for i in candidates.tolist()),
+        dtype=np.int64,
+        count=len(candidates),
     )
-    most_similar_users_sorted = [(u[0], u[1]) for u in most_similar_users_sorted]
-    if len(most_similar_users_sorted) > limit:
-        cut_at = len(most_similar_users_sorted)
-        for i, u in enumerate(most_similar_users_sorted[limit:]):
-            overlap = u[1]
-            if overlap == 1:
-                cut_at = limit + i
-                break
-        most_similar_users_sorted = most_similar_users_sorted[:cut_at]
-    # Update COEDIT_DATA so future calls don't need to repeat this process
-    COEDIT_DATA[user_text] = most_similar_users_sorted
+    order = candidates[np.lexsort((num_pages, -num_overlaps[candidates]))][:cut_at]
+    num_overlaps = num_overlaps[order]
+    return [
+        (neighbors[i], overlap)
+        for i, overlap in zip(order.tolist(), num_overlaps.tolist())
+    ]
+
+
+def get_window_users(revs, user_text, k):
+    """Find the users that edited a page within the window of revisions `[i - k, i + k)`
+    around any revision `i` by `user_text`. Users are returned once, in order of revision."""
+    if not revs:
+        return []
+    users = np.array([e.get("user", "") for e in revs])
+    is_user = users == user_text
+    user_edit_indices = np.flatnonzero(is_user)
+    if not user_edit_indices.size:
+        return []
+    # Count the windows covering each revision: +1 where a window starts, -1 past its end.
+    n = len(users)
+    starts = np.maximum(user_edit_indices - k, 0)
+    ends = np.minimum(user_edit_indices + k, n)
+    covered = np.cumsum(np.bincount(starts, minlength=n + 1) - np.bincount(ends, minlength=n + 1))[:n] > 0
+    # edits by hidden users have no "user" field
+    return list(dict.fromkeys(users[covered & ~is_user & (users != "")].tolist()))
+
+
+def parse_timestamp(ts):
+    """Parse a `TIME_FORMAT` timestamp with `datetime.fromisoformat`, about 30x faster than `datetime.strptime`."""
+    # fromisoformat() alone also accepts UTC offsets, and other ISO 8601 variants.
+    if len(ts) != 20 or ts[-1] != "Z" or ts[10] != "T":
+        raise ValueError(f"time data {ts!r} does not match format {TIME_FORMAT!r}")
+    return datetime.fromisoformat(ts[:-1])
+
+
+def parse_timestamps(timestamps):
+    """Parse a list of `TIME_FORMAT` timestamps at once, into a `datetime64[s]` array."""
+    timestamps = np.array(timestamps, dtype=str)
+    if not ((np.char.str_len(timestamps) == 20).all() and np.char.endswith(timestamps, "Z").all()):
+        raise ValueError(f"time data does not match format {TIME_FORMAT!r}")
+    # numpy no longer parses UTC designators: drop the trailing "Z".
+    return timestamps.astype("U19").astype("datetime64[s]")
+
+
+def strtobool(val):
+    """Convert a string representation of truth to a bool, as `distutils.util.strtobool` did."""
+    try:
+        return BOOLEAN_VALUES[val]
+    except KeyError:
+        raise ValueError(f"invalid truth value {val!r}") from None
 
 
 def chunkify(l, k=50):
@@ -616,14 +1023,14 @@ def chunkify(l, k=50):
 
 def check_user_text(user_text, lang="en"):
     # already in dataset -- meets valid user criteria
-    if user_text in USER_METADATA:
+    if cached_metadata(user_text):
         return None
 
     # wasn't in dataset
     # this could be because they have only contributed since the date of the dumps
     # but have to be careful to filter out bots still
     # unfortunately no one API call can give: is user/anon but not bot
-    session = make_mwapi_session(
+    session = get_mwapi_session(
         lang,
         app.config["CUSTOM_UA"],
         app.config["MWAPI_RETRIES"],
@@ -668,17 +1075,8 @@ def check_user_text(user_text, lang="en"):
                 ),
                 "error-type": "user-no-account"
             }
-        # anon (has contribs but not a valid account name)
+        # anon (has contribs but not a valid account name): NEW_USER_METADATA unless in the dataset
         elif "invalid" in result["query"]["users"][0]:
-            USER_METADATA[user_text] = {
-                "is_anon": True,
-                "num_edits": 0,
-                "num_pages": 0,
-                "most_recent_edit": None,
-                "oldest_edit": None,
-            }
-            TEMPORAL_DATA[user_text] = {"d": [0] * 7, "h": [0] * 24}
-            COEDIT_DATA[user_text] = []
             return None
         elif "groups" in result["query"]["users"][0]:
             # bot
@@ -693,17 +1091,8 @@ def check_user_text(user_text, lang="en"):
                     ),
                     "error-type": "user-bot"
                 }
-            # exists and is user but wasn't in original dataset
+            # exists and is user but wasn't in original dataset (see NEW_USER_METADATA)
             else:
-                USER_METADATA[user_text] = {
-                    "is_anon": False,
-                    "num_edits": 0,
-                    "num_pages": 0,
-                    "most_recent_edit": None,
-                    "oldest_edit": None,
-                }
-                TEMPORAL_DATA[user_text] = {"d": [0] * 7, "h": [0] * 24}
-                COEDIT_DATA[user_text] = []
                 app.logger.debug(
                     "Received request for user %s but user is not in dataset", user_text
                 )
@@ -753,76 +1142,290 @@ def validate_api_args(lang):
     return user_text, num_similar, followup, error
 
 
+def open_resource(path, mode="r", newline=None):
+    """Open an input file that is read once, from start to end.
+
+    Where supported (Linux, and most Unix systems), the kernel is told so: it then reads
+    ahead more aggressively, so that reads rarely block on the disk while rows are being
+    parsed and inserted.
+    """
+    fin = open(path, mode, newline=newline)
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fin.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            # e.g. pipes: this is only a hint
+            pass
+    return fin
+
+
+def copy_resource(path, model, expected_header, columns):
+    """
+    On PostgreSQL, load a resource file with a single COPY statement: the file is streamed
+    to the server as is, without parsing its rows in Python. Its fields must be those of
+    `columns`, in the same order, and need no conversion.
+
+    Fields are tab separated, and never quoted. An invalid row aborts the COPY: it is then
+    rolled back, for the file to be loaded (and invalid rows skipped) by the other loaders.
+
+    :return: whether the file was loaded
+    """
+    connection = database.session.connection()
+    if connection.dialect.name != "postgresql":
+        return False
+    with open_resource(path) as fin:
+        assert next(fin).strip().split("\t") == expected_header
+        savepoint = database.session.begin_nested()
+        cursor = database.session.connection().connection.cursor()
+        try:
+            # the CSV format, rather than text, doesn't interpret backslashes in user names
+            cursor.copy_expert(
+                f'COPY "{model.__tablename__}" ({", ".join(columns)}) FROM STDIN '
+                "WITH (FORMAT csv, DELIMITER E'\\t', QUOTE E'\\x01')",
+                fin,
+            )
+        except connection.dialect.dbapi.Error as e:
+            app.logger.warning("Failed to COPY %s, loading it row by row: %s", path, e)
+            savepoint.rollback()
+            return False
+        finally:
+            cursor.close()
+    savepoint.commit()
+    return True
+
+
+def clear_table(model):
+    """
+    Delete the rows of the table of `model`, as part of the current transaction: reloading
+    into a persistent database replaces its data, rather than violating its primary keys.
+    """
+    dialect = database.session.bind.dialect
+    if dialect.name == "postgresql":
+        # Transactional on PostgreSQL (unlike MySQL, where TRUNCATE implicitly commits) and,
+        # unlike DELETE, doesn't visit every row.
+        database.session.execute(f"TRUNCATE TABLE {dialect.identifier_preparer.quote(model.__tablename__)}")
+    else:
+        # Elsewhere, every row is deleted (and, on MySQL, kept in the undo log) until the load
+        # commits: replacing a full dataset this way, e.g. the ~1.1G coedit table, is slow.
+        # Refresh large persistent databases with `migrations/ingest.py --swap-tables` instead.
+        database.session.query(model).delete()
+
+
 def load_coedit_data(resource_dir):
-    """Load preprocessed data about edit overlap between users."""
+    """Load preprocessed data about edit overlap between users, replacing the ones in the database."""
     app.logger.info("Loading co-edit data")
+    clear_table(Coedit)
     expected_header = ["user_text", "user_neighbor", "num_pages_overlapped"]
-    with open(os.path.join(resource_dir, "coedit_counts.tsv"), "r") as fin:
+    if copy_resource(
+        os.path.join(resource_dir, "coedit_counts.tsv"),
+        Coedit,
+        expected_header,
+        ["user_text", "user_text_neighbour", "overlap_count"],
+    ):
+        return
+    if pacsv is not None:
+        load_arrow(
+            os.path.join(resource_dir, "coedit_counts.tsv"),
+            Coedit,
+            expected_header,
+            {"num_pages_overlapped": pa.int32()},
+            lambda block: {
+                "user_text": block["user_text"],
+                "user_text_neighbour": block["user_neighbor"],
+                "overlap_count": block["num_pages_overlapped"],
+            },
+        )
+        return
+    with open_resource(os.path.join(resource_dir, "coedit_counts.tsv")) as fin:
         assert next(fin).strip().split("\t") == expected_header
-        for line_str in fin:
-            try:
-                line = line_str.strip().split("\t")
-                user_text = line[0]
-                user_text_neighbour = line[1]
-                overlap_count = int(line[2])
-
-                coedit = Coedit(
-                    user_text=user_text,
-                    user_text_neighbour=user_text_neighbour,
-                    overlap_count=overlap_count,
-                )
-            except Exception as e:
-                app.logger.error(f"Failed to parse record {line_str}: {e}")
-            else:
-                database.session.add(coedit)
-        database.session.commit()
+        rejected = []
+        insert_mappings(Coedit, parse_coedit_data(fin, rejected))
+    log_rejected(rejected)
+
+
+def parse_coedit_data(fin, rejected):
+    """Parse coedit lines into Coedit mappings. Invalid lines are appended, with
+    the reason they were rejected, to `rejected`."""
+    for line_str in fin:
+        # The last field is an integer: int() ignores the line terminator.
+        # Valid lines are split anyway: checking the number of fields of the split, rather
+        # than counting tabs first, scans each line once.
+        line = line_str.split("\t")
+        if len(line) != 3:
+            rejected.append((line_str, f"expected 3 fields, got {len(line)}"))
+            continue
+        try:
+            overlap_count = int(line[2])
+        except ValueError as e:
+            rejected.append((line_str, e))
+            continue
+        yield dict(
+            user_text=line[0],
+            user_text_neighbour=line[1],
+            overlap_count=overlap_count,
+        )
+
+
+def log_rejected(rejected):
+    """Log the (line, reason) pairs of the lines a loader could not parse, once it is done."""
+    for line_str, reason in rejected:
+        app.logger.error("Failed to parse record %s: %s", line_str.rstrip(), reason)
+
+
+def insert_mappings(model, mappings):
+    """Insert an iterable of dicts into the table of `model`, LOAD_BATCH_SIZE rows at a time,
+    with executemany() rather than one INSERT per ORM object."""
+    insert = model.__table__.insert()
+    mappings = iter(mappings)
+    batch = list(islice(mappings, LOAD_BATCH_SIZE))
+    while batch:
+        database.session.execute(insert, batch)
+        batch = list(islice(mappings, LOAD_BATCH_SIZE))
+
+
+def load_arrow(path, model, expected_header, column_types, map_columns):
+    """Load a TSV file into the table of `model` with pyarrow's CSV reader, which parses
+    and converts a block of the file at a time, in C++.
+
+    Rows with an unexpected number of fields are skipped, as by the line by line loaders,
+    but values that cannot be converted to their `column_types` abort the load.
+
+    :param column_types: a dict of pyarrow types of the columns of the file
+    :param map_columns: a function of a record batch of the file, returning a dict
+        of `model` columns to arrays
+    """
+    # pyarrow may invoke the handler from its own threads, outside of the app context.
+    invalid_rows = []
+
+    def skip_invalid_row(row):
+        invalid_rows.append(row.text)
+        return "skip"
+
+    with open_resource(path, "rb") as fin:
+        reader = pacsv.open_csv(
+            fin,
+            parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False, invalid_row_handler=skip_invalid_row),
+            convert_options=pacsv.ConvertOptions(
+                column_types=column_types, true_values=TRUE_VALUES, false_values=FALSE_VALUES
+            ),
+        )
+        assert reader.schema.names == expected_header
+        for block in reader:
+            columns = map_columns(block)
+            insert_mappings(model, pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns)).to_pylist())
+    log_rejected((line_str, "unexpected number of fields") for line_str in invalid_rows)
 
 
 def load_temporal_data(resource_dir):
-    """Load preprocessed temporal information about when an account has edited."""
+    """Load preprocessed temporal information about when an account has edited, replacing the
+    ones in the database."""
     app.logger.info("Loading temporal data")
+    clear_table(Temporal)
     expected_header = ["user_text", "day_of_week", "hour_of_day", "num_edits"]
-    with open(os.path.join(resource_dir, "temporal.tsv"), "r") as fin:
+    if pacsv is not None:
+        load_arrow(
+            os.path.join(resource_dir, "temporal.tsv"),
+            Temporal,
+            expected_header,
+            {"day_of_week": pa.int8(), "hour_of_day": pa.int8(), "num_edits": pa.int32()},
+            lambda block: {
+                "user_text": block["user_text"],
+                "d": pc.subtract(block["day_of_week"], 1),  # 0 Sunday - 6 Saturday
+                "h": block["hour_of_day"],  # 0 - 23
+                "num_edits": block["num_edits"],
+            },
+        )
+        return
+    with open_resource(os.path.join(resource_dir, "temporal.tsv")) as fin:
         assert next(fin).strip().split("\t") == expected_header
-        for line_str in fin:
-            try:
-                line = line_str.strip().split("\t")
-                user_text = line[0]
-                day_of_week = int(line[1]) - 1  # 0 Sunday - 6 Saturday
-                hour_of_day = int(line[2])  # 0 - 23
-                num_edits = int(line[3])
-
-                temporal = Temporal(
-                    user_text=user_text,
-                    d=day_of_week,
-                    h=hour_of_day,
-                    num_edits=num_edits,
-                )
+        rejected = []
+        insert_mappings(Temporal, parse_temporal_data(fin, rejected))
+    log_rejected(rejected)
+
+
+def parse_temporal_data(fin, rejected):
+    """Parse temporal lines into Temporal mappings, see `parse_coedit_data`."""
+    for line_str in fin:
+        line = line_str.split("\t")
+        if len(line) != 4:
+            rejected.append((line_str, f"expected 4 fields, got {len(line)}"))
+            continue
+        try:
+            day_of_week = int(line[1]) - 1  # 0 Sunday - 6 Saturday
+            hour_of_day = int(line[2])  # 0 - 23
+            num_edits = int(line[3])
+        except ValueError as e:
+            rejected.append((line_str, e))
+            continue
+        yield dict(
+            user_text=line[0],
+            d=day_of_week,
+            h=hour_of_day,
+            num_edits=num_edits,
+        )
 
-            except Exception as e:
-                app.logger.error(f"Failed to parse record {line_str}: {e}")
-            else:
-                database.session.add(temporal)
-        database.session.commit()
+
+# Number of hours in a week: temporal data is counted per hour of the week.
+WEEK_HOURS = 7 * 24
+
+
+@lru_cache(maxsize=None)
+def parse_temporal_offset(temporal_offset):
+    """Parse the TEMPORAL_OFFSET option, e.g. "(-1, 0, 1)", once, into a (read only) array of hours."""
+    offsets = np.array(make_tuple(temporal_offset), dtype=np.int64)
+    offsets.setflags(write=False)
+    return offsets
 
 
-def update_temporal_data(user_text, day, hour, num_edits):
-    """Update data on hours / days in which a user has edited."""
-    if user_text not in TEMPORAL_DATA:
-        TEMPORAL_DATA[user_text] = {"d": [0] * 7, "h": [0] * 24}
+@lru_cache(maxsize=None)
+def smearing_matrix(temporal_offset):
+    """The (WEEK_HOURS, 7 + 24) matrix that maps counts of edits per hour of the week to
+    their day and hour counts, smeared by TEMPORAL_OFFSET: an edit at hour `i` of the
+    week is counted at each of the hours `i + offset` (wrapping around the week)."""
+    offsets = parse_temporal_offset(temporal_offset)
+    week_hours = np.repeat(np.arange(WEEK_HOURS), len(offsets))
+    smeared = (week_hours + np.tile(offsets, WEEK_HOURS)) % WEEK_HOURS
+    matrix = np.zeros((WEEK_HOURS, 7 + 24))
+    np.add.at(matrix, (week_hours, smeared // 24), 1)
+    np.add.at(matrix, (week_hours, 7 + smeared % 24), 1)
+    matrix.setflags(write=False)
+    return matrix
+
+
+def update_temporal_data(temporal, day, hour, num_edits):
+    """Update data on hours / days in which a user has edited: `temporal` holds their
+    day ("d") and hour ("h") counts."""
+    update_temporal_data_from_edits(temporal, [day], [hour], [num_edits])
+
+
+def update_temporal_data_from_edits(temporal, days, hours, num_edits=None):
+    """Update data on hours / days in which a user has edited, with a list of
+    `num_edits[i]` edits (one each, by default) made at `days[i]`, `hours[i]`.
+    Equivalent to `update_temporal_data(temporal, day, hour, n)` for each of them."""
+    day_counts, hour_counts = temporal_counts(days, hours, num_edits)
+    temporal["d"] += day_counts
+    temporal["h"] += hour_counts
+
+
+def temporal_counts(days, hours, num_edits=None):
+    """The day and hour counts of a list of `num_edits[i]` edits (one each, by default)
+    made at `days[i]`, `hours[i]`. Edits are counted per hour of the week at once with
+    numpy, and these counts smeared with a single product (see `smearing_matrix`).
+
+    :return: a (day counts, hour counts) tuple of arrays
+    """
+    week_hours = (np.asarray(days, dtype=np.int64) * 24 + np.asarray(hours, dtype=np.int64)) % WEEK_HOURS
+    counts = np.bincount(week_hours, weights=num_edits, minlength=WEEK_HOURS)
     # potentially smear data so edits in nearby hours also overlap (not just direct matches)
-    offset_tup = make_tuple(app.config["TEMPORAL_OFFSET"])
-    for offset in offset_tup:
-        h = hour + offset  # -1 to 24
-        d = (day + (h // 24)) % 7
-        h = h % 24
-        TEMPORAL_DATA[user_text]["d"][d] += num_edits
-        TEMPORAL_DATA[user_text]["h"][h] += num_edits
+    smeared = counts @ smearing_matrix(app.config["TEMPORAL_OFFSET"])
+    return smeared[:7], smeared[7:]
 
 
 def load_metadata(resource_dir):
-    """Load some basic statistics about coverage of each account in the data."""
+    """Load some basic statistics about coverage of each account in the data, replacing the
+    ones in the database."""
     app.logger.info("Loading metadata")
+    clear_table(UserMetadata)
     expected_header = [
         "user_text",
         "is_anon",
@@ -831,61 +1434,235 @@ def load_metadata(resource_dir):
         "most_recent_edit",
         "oldest_edit",
     ]
-    with open(os.path.join(resource_dir, "metadata.tsv"), "r") as fin:
+    # PostgreSQL parses TIME_FORMAT timestamps, and ignores their UTC designator
+    # when storing them as naive datetimes.
+    if copy_resource(os.path.join(resource_dir, "metadata.tsv"), UserMetadata, expected_header, expected_header):
+        return
+    if pacsv is not None:
+        # Timestamps are parsed as UTC (TIME_FORMAT), and stored as naive datetimes.
+        load_arrow(
+            os.path.join(resource_dir, "metadata.tsv"),
+            UserMetadata,
+            expected_header,
+            {
+                "is_anon": pa.bool_(),
+                "num_edits": pa.int32(),
+                "num_pages": pa.int32(),
+                "most_recent_edit": pa.timestamp("s", tz="UTC"),
+                "oldest_edit": pa.timestamp("s", tz="UTC"),
+            },
+            lambda block: {
+                name: pc.cast(block[name], pa.timestamp("s")) if name.endswith("_edit") else block[name]
+                for name in expected_header
+            },
+        )
+        return
+    with open_resource(os.path.join(resource_dir, "metadata.tsv"), newline="") as fin:
+        # csv.reader also handles line terminators. Its split is slower than str.split for the
+        # short coedit and temporal lines, so those are parsed by hand.
+        reader = csv.reader(fin, delimiter="\t", quoting=csv.QUOTE_NONE)
+        assert next(reader) == expected_header
+        rejected = []
+        insert_mappings(UserMetadata, parse_metadata(reader, rejected))
+    log_rejected(rejected)
+
+
+def parse_metadata(rows, rejected):
+    """Parse metadata rows into UserMetadata mappings, see `parse_coedit_data`."""
+    for line in rows:
+        if len(line) != 6:
+            rejected.append(("\t".join(line), f"expected 6 fields, got {len(line)}"))
+            continue
+        try:
+            user = dict(
+                user_text=line[0],
+                is_anon=strtobool(line[1]),
+                num_edits=int(line[2]),
+                num_pages=int(line[3]),
+                most_recent_edit=parse_timestamp(line[4]),
+                oldest_edit=parse_timestamp(line[5]),
+            )
+        except ValueError as e:
+            rejected.append(("\t".join(line), e))
+            continue
+        yield user
+
+
+# lookup_user() queries are built once, and compiled once per dialect (SQLAlchemy 1.3 only
+# caches compiled statements in an explicit compiled_cache).
+LOOKUP_COMPILED_CACHE = {}
+USER_QUERY = select([UserMetadata.__table__]).where(UserMetadata.user_text == bindparam("user_text"))
+# Coedit and Temporal rows are read in a single round trip: a union of
+# (neighbour, overlap_count, NULL, NULL) and (NULL, num_edits, d, h) rows.
+# Joining both tables to the user would return the product of their rows instead.
+NEIGHBOURS_QUERY = union_all(
+    select([
+        Coedit.user_text_neighbour.label("neighbour"),
+        Coedit.overlap_count.label("count"),
+        cast(null(), Integer).label("d"),
+        cast(null(), Integer).label("h"),
+    ]).where(Coedit.user_text == bindparam("user_text")),
+    select([
+        cast(null(), String).label("neighbour"),
+        Temporal.num_edits.label("count"),
+        Temporal.d,
+        Temporal.h,
+    ]).where(Temporal.user_text == bindparam("user_text")),
+)
 
-        assert next(fin).strip().split("\t") == expected_header
-        for line_str in fin:
-            # TODO use csv library here?
-            try:
-                line = line_str.strip().split("\t")
-                user_text = line[0]
-                user = UserMetadata(
-                    user_text=user_text,
-                    is_anon=bool(distutils.util.strtobool(line[1])),
-                    num_edits=int(line[2]),
-                    num_pages=int(line[3]),
-                    most_recent_edit=datetime.strptime(line[4], TIME_FORMAT),
-                    oldest_edit=datetime.strptime(line[5], TIME_FORMAT),
-                )
-            except Exception as e:
-                app.logger.error(f"Failed to parse record {line_str}: {e}")
-            else:
-                database.session.add(user)
-        database.session.commit()
 
+def intern_user_text(user_text):
+    """
+    The same users are the neighbours of many others: intern their names, so that
+    the cached coedit lists of all these users share a single copy of each name.
 
-def lookup_user(user_text):
+    :param user_text: a user name, as a str (or bytes, which cannot be interned)
+    :return: the interned user name
+    """
+    if isinstance(user_text, str):
+        return sys.intern(user_text)
+    return user_text
+
+
+@dataclass(frozen=True)
+class LookupResult:
+    """The data of a user in the database, as read by `fetch_user`."""
+    # The user's metadata, as a read only mapping, or None
+    metadata: object
+    # (neighbour, overlap_count) tuples
+    coedits: tuple
+    # Day-of-week and hour-of-day edit counts, smeared by TEMPORAL_OFFSET (read only arrays)
+    temporal_d: np.ndarray
+    temporal_h: np.ndarray
+
+
+@cached(LOOKUP_CACHE, key=lambda user_text: user_text)
+def fetch_user(user_text):
     """
-    Lookup user data from the database, and populate session globals.
+    Read the data of a user from the database, through LOOKUP_CACHE.
 
     :param user_text: the username we want to analyze.
-    :return:
+    :return: a LookupResult
     """
+    connection = database.session.connection().execution_options(compiled_cache=LOOKUP_COMPILED_CACHE)
     with ExecutionTime() as timer:
-        metadata = UserMetadata.query.filter_by(user_text=user_text).first()
-    app.logger.debug(f"Finished lookup_user UserMetadata lookup in {timer.elapsed:0.4f} seconds")
+        metadata = connection.execute(USER_QUERY, user_text=user_text).first()
+    app.logger.debug("Finished lookup_user UserMetadata lookup in %0.4f seconds", timer.elapsed)
 
-    USER_METADATA[user_text] = metadata.__dict__ if metadata else {}
     with ExecutionTime() as timer:
-        COEDIT_DATA[user_text] = [
-            (row.user_text_neighbour, row.overlap_count)
-            for row in Coedit.query.filter_by(user_text=user_text).all()
-        ]
-    app.logger.debug(f"Finished Coedit data filtering in {timer.elapsed:0.4f} seconds")
+        coedits = []
+        days = []
+        hours = []
+        num_edits = []
+        for neighbour, count, d, h in connection.execute(NEIGHBOURS_QUERY, user_text=user_text):
+            if d is None:
+                coedits.append((intern_user_text(neighbour), count))
+            else:
+                days.append(d)
+                hours.append(h)
+                num_edits.append(count)
+    app.logger.debug("Finished Coedit and temporal data lookup in %0.4f seconds", timer.elapsed)
+
+    if days:
+        temporal_d, temporal_h = temporal_counts(days, hours, num_edits)
+        temporal_d.setflags(write=False)
+        temporal_h.setflags(write=False)
+    else:
+        temporal_d, temporal_h = ZERO_VECTORS["d"], ZERO_VECTORS["h"]
+    return LookupResult(
+        MappingProxyType(dict(metadata)) if metadata else None, tuple(coedits), temporal_d, temporal_h
+    )
 
-    TEMPORAL_DATA[user_text] = {"d": [0] * 7, "h": [0] * 24}
 
-    with ExecutionTime() as timer:
-        temporal = Temporal.query.filter_by(user_text=user_text).first()
-        if temporal:
-            update_temporal_data(user_text, temporal.d, temporal.h, temporal.num_edits)
-    app.logger.debug(f"Finished temporal data filtering in {timer.elapsed:0.4f} seconds")
+def clear_caches():
+    """Forget the users read from the database."""
+    LOOKUP_CACHE.clear()
+    TEMPORAL_DATA.clear()
+
+
+def dataset_version():
+    """The dataset_id of the dataset loaded in the database, or None."""
+    return database.session.query(Dataset.dataset_id).limit(1).scalar()
+
+
+def set_dataset_version(dataset_id):
+    """Record `dataset_id` as the dataset loaded in the database, as part of the current transaction."""
+    database.session.query(Dataset).delete()
+    database.session.add(Dataset(dataset_id=str(dataset_id)))
+
+
+def lookup_user(user_text):
+    """
+    Lookup user data from the database, and cache it for the requests that have the user
+    as a neighbour.
+
+    The result is read only: a request copies the data it updates with the user's latest edits.
+
+    :param user_text: the username we want to analyze.
+    :return: the user's LookupResult
+    """
+    result = fetch_user(user_text)
+    TEMPORAL_DATA.set(user_text, result.temporal_d, result.temporal_h)
+    return result
 
 
 def load_data(resourcedir):
-    load_metadata(resourcedir)
-    load_coedit_data(resourcedir)
-    load_temporal_data(resourcedir)
+    """Load all the input data.
+
+    On SQLite, which only has one writer at a time, files are loaded in a single transaction:
+    that is, with one commit (and fsync) only, and leaving the database untouched if any file
+    fails to load.
+
+    On other databases, files are loaded concurrently, in three independent transactions
+    (see `load_concurrently`): they are all rolled back if any file fails to load, but if one
+    of the final commits fails after another succeeded, the tables are left partly loaded.
+
+    Once loaded, the data is recorded as a new dataset (see `check_dataset_version`)."""
+    loaders = (load_metadata, load_coedit_data, load_temporal_data)
+    if database.session.bind.dialect.name != "sqlite":
+        load_concurrently(resourcedir, loaders)
+        set_dataset_version(uuid.uuid4())
+        database.session.commit()
+        return
+    try:
+        for loader in loaders:
+            loader(resourcedir)
+        set_dataset_version(uuid.uuid4())
+    except Exception:
+        database.session.rollback()
+        raise
+    database.session.commit()
+
+
+def load_concurrently(resourcedir, loaders):
+    """Run each of `loaders` in its own thread, and so with its own session and database connection.
+
+    Transactions are committed once all loaders are done, or all rolled back if any of them
+    failed. A commit can still fail after others succeeded: this is not a distributed
+    transaction.
+    """
+    flask_app = app._get_current_object()
+    loaded = threading.Barrier(len(loaders))
+    errors = []
+
+    def load(loader):
+        with flask_app.app_context():
+            try:
+                loader(resourcedir)
+            except Exception as e:
+                errors.append(e)
+                raise
+            finally:
+                loaded.wait()
+                if errors:
+                    database.session.rollback()
+                else:
+                    database.session.commit()
+
+    with ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="load") as executor:
+        futures = [executor.submit(load, loader) for loader in loaders]
+    for future in futures:
+        future.result()
 
 
 def parse_args():
@@ -930,9 +1707,18 @@ def init_app_resources(app, resourcedir):
         # rather than using a global object.
         try:
             database.create_all()
-            load_data(resourcedir)
+            # Build the secondary indexes once the rows are inserted, rather than
+            # updating them at every insert.
+            drop_coedit_covering_index.execute(bind=database.engine, target=Coedit.__table__)
+            try:
+                load_data(resourcedir)
+                clear_caches()
+            finally:
+                create_coedit_covering_index.execute(bind=database.engine, target=Coedit.__table__)
         except Exception as e:
-            app.logger.error(f"Failed to load input data: {e}")
+            app.logger.error("Failed to load input data: %s", e)
+        finally:
+            DATA_READY.set()
 
 
 def configure_app(args=None):
@@ -963,7 +1749,11 @@ def configure_app(args=None):
     app = create_app(config=config_yaml)
     if resource_path:
         # TODO(gmodena, 2020-10-11): we should delegate this step to the ingestion script
-        init_app_resources(app, resource_path)
+        # Load the data in the background: the service starts (and answers /healthz) at once.
+        DATA_READY.clear()
+        threading.Thread(
+            target=init_app_resources, args=(app, resource_path), name="init_app_resources", daemon=True
+        ).start()
     if "LOG_LEVEL" in config_yaml:
         logging.basicConfig(level=logging.getLevelName(config_yaml["LOG_LEVEL"]))
 
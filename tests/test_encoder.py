@@ -1,8 +1,31 @@
-from similar_users.factory import BinaryJSONEncoder
+from similar_users.factory import BinaryJSONEncoder, jsonify
 
+import flask
 import json
 
 
 def test_binary_jsonencoder():
     data = {'key1': b"binary_value", "key2": "value"}
     assert json.dumps(data, cls=BinaryJSONEncoder)
+
+
+def test_binary_jsonencoder_sort_keys():
+    data = {"key2": [b"binary_value", 1, None], "key1": {"nested": bytearray(b"value")}}
+    encoded = json.dumps(data, cls=BinaryJSONEncoder, sort_keys=True)
+    assert encoded.index("key1") < encoded.index("key2")
+    assert json.loads(encoded) == {"key1": {"nested": "value"}, "key2": ["binary_value", 1, None]}
+    assert json.loads(json.dumps(data, cls=BinaryJSONEncoder, indent=4)) == json.loads(encoded)
+
+
+def test_jsonify():
+    app = flask.Flask(__name__)
+    app.json_encoder = BinaryJSONEncoder
+    data = {"key2": [b"binary_value", 1, None], "key1": "välue"}
+    with app.app_context():
+        response = jsonify(data)
+        expected = flask.jsonify(data)
+        assert response.get_data() == expected.get_data()
+        assert response.mimetype == expected.mimetype == "application/json"
+        assert jsonify(key=1).get_json() == {"key": 1}
+        app.debug = True
+        assert jsonify(data).get_data() == flask.jsonify(data).get_data()
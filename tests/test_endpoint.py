@@ -1,6 +1,8 @@
 import json
 import pytest
+import threading
 from conftest import TEST_USER, TEST_USER_MISSING
+from similar_users import wsgi
 
 
 def get_url(client, credentials, url="/", headers=None):
@@ -30,4 +32,12 @@ def test_database_refresh(client, credentials):
     rv = get_url(client, credentials, url='/database/refresh')
     expected = {'in_progress': False}
     assert rv.status_code == 200
-    assert json.loads(rv.data) == expected
\ No newline at end of file
+    assert json.loads(rv.data) == expected
+
+
+def test_get_similarusers_loading(client, credentials, monkeypatch):
+    monkeypatch.setattr(wsgi, "DATA_READY", threading.Event())
+    rv = get_url(client, credentials, url=f"/similarusers?usertext={TEST_USER}")
+    assert rv.status_code == 503
+    assert json.loads(rv.data) == {"status": "loading"}
+    assert client.get("/healthz").status_code == 200
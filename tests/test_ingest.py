@@ -0,0 +1,218 @@
+import pytest
+import threading
+from datetime import datetime
+
+from migrations.ingest import Sink, TemporalSource, MetadataSource, CoeditSource
+from similar_users import wsgi
+from similar_users.models import Coedit, Dataset, Temporal, UserMetadata
+
+
+@pytest.fixture
+def resourcedir(tmp_path):
+    files = {
+        "temporal.tsv": [
+            "user_text\tday_of_week\thour_of_day\tnum_edits",
+            "testuser\t1\t21\t86",
+            "127.0.0.1\t7\t0\t1",
+        ],
+        "metadata.tsv": [
+            "user_text\tis_anon\tnum_edits\tnum_pages\tmost_recent_edit\toldest_edit",
+            "testuser\tFalse\t4139\t3520\t2020-09-21T23:42:39Z\t2020-06-28T17:24:14Z",
+            "127.0.0.1\tTrue\t1\t1\t2020-02-04T16:26:02Z\t2020-02-04T16:26:02Z",
+        ],
+        "coedit_counts.tsv": [
+            "user_text\tuser_neighbor\tnum_pages_overlapped",
+            "testuser\t127.0.0.1\t1",
+            "127.0.0.1\ttestuser\t1",
+        ],
+    }
+    for file_name, lines in files.items():
+        (tmp_path / file_name).write_text("\n".join(lines) + "\n")
+    return tmp_path
+
+
+def read_all(read_batches, source, batch_size=1):
+    path = str(source.resourcedir / source.file_name)
+    return [mappings for _, mappings in read_batches(source, path, batch_size, "test")]
+
+
+@pytest.mark.parametrize("source_class", [TemporalSource, MetadataSource, CoeditSource])
+def test_arrow_and_csv_readers_agree(app, resourcedir, source_class):
+    sink = Sink(sources=[])
+    source = source_class(resourcedir=resourcedir)
+    batches = read_all(sink._read_arrow, source)
+    assert batches == read_all(sink._read_csv, source)
+    assert len(batches) == 2
+
+
+def test_read_metadata(app, resourcedir):
+    source = MetadataSource(resourcedir=resourcedir)
+    (record,), _ = read_all(Sink._read_arrow, source)
+    assert record == dict(
+        user_text="testuser",
+        is_anon=False,
+        num_edits=4139,
+        num_pages=3520,
+        most_recent_edit=datetime(2020, 9, 21, 23, 42, 39),
+        oldest_edit=datetime(2020, 6, 28, 17, 24, 14),
+        dataset_id="test",
+    )
+
+
+@pytest.mark.parametrize("literal", ["True", "yes", "t", "ON", "0", "n", "Off"])
+def test_boolean_literals(db_session, tmp_path, monkeypatch, literal):
+    # The service loaders, and the ingestion readers, all parse the same metadata.tsv alike.
+    (tmp_path / "metadata.tsv").write_text(
+        "user_text\tis_anon\tnum_edits\tnum_pages\tmost_recent_edit\toldest_edit\n"
+        f"a\t{literal}\t1\t1\t2020-02-04T16:26:02Z\t2020-02-04T16:26:02Z\n"
+    )
+    expected = wsgi.strtobool(literal)
+    source = MetadataSource(resourcedir=tmp_path)
+    for read_batches in (Sink._read_arrow, Sink(sources=[])._read_csv):
+        ((record,),) = read_all(read_batches, source)
+        assert record["is_anon"] is expected
+    for pacsv in (wsgi.pacsv, None):
+        monkeypatch.setattr(wsgi, "pacsv", pacsv)
+        wsgi.load_metadata(tmp_path)
+        assert db_session.query(UserMetadata).get("a").is_anon is expected
+
+
+def test_write(db_session, resourcedir):
+    sources = [source_class(resourcedir=resourcedir)
+               for source_class in (TemporalSource, MetadataSource, CoeditSource)]
+    sink = Sink(sources=sources)
+    sink.write(batch_size=1)
+    assert [stat["inserted"] for stat in sink.stats] == [2, 2, 2]
+    assert db_session.query(Coedit).count() == 2
+    assert all(stat["parse_seconds"] > 0 and stat["commit_seconds"] > 0 for stat in sink.stats)
+    # Recorded once all the sources are loaded
+    assert db_session.query(Dataset.dataset_id).one() == (str(sink.dataset_id),)
+
+
+@pytest.mark.parametrize("read_batches", [Sink._read_arrow, Sink(sources=[])._read_csv])
+def test_rejects(app, resourcedir, read_batches):
+    path = resourcedir / CoeditSource.file_name
+    with path.open("a") as f:
+        f.write("invalid\trow\n")
+    source = CoeditSource(resourcedir=resourcedir)
+    assert sum(len(mappings) for mappings in read_all(read_batches, source)) == 2
+    assert (resourcedir / f"{CoeditSource.file_name}.rejected").read_text() == "invalid\trow\n"
+
+    with pytest.raises(Exception):
+        read_all(read_batches, CoeditSource(resourcedir=resourcedir, strict=True))
+
+
+def test_write_group_commits(db_session, resourcedir):
+    sink = Sink(sources=[CoeditSource(resourcedir=resourcedir)])
+    sink.write(batch_size=1, commit_every_rows=1)
+    assert [stat["inserted"] for stat in sink.stats] == [2]
+    assert db_session.query(Coedit).count() == 2
+
+
+@pytest.mark.parametrize("read_batches", [Sink._read_arrow, Sink(sources=[])._read_csv])
+def test_read_shards(app, resourcedir, read_batches):
+    source = CoeditSource(resourcedir=resourcedir)
+    path = str(resourcedir / source.file_name)
+    byte_ranges = Sink._shard_ranges(path, 3)
+    assert len(byte_ranges) == 3
+    assert byte_ranges[0][0] == 0 and byte_ranges[-1][1] == len(open(path, "rb").read())
+
+    records = [record
+               for byte_range in byte_ranges
+               for _, mappings in read_batches(source, path, 1, "test", byte_range=byte_range)
+               for record in mappings]
+    assert records == [record for mappings in read_all(read_batches, source) for record in mappings]
+
+
+@pytest.mark.parametrize("use_arrow", [True, False])
+def test_load_coedit_data(db_session, tmp_path, monkeypatch, use_arrow):
+    if not use_arrow:
+        monkeypatch.setattr(wsgi, "pacsv", None)
+    monkeypatch.setattr(wsgi, "LOAD_BATCH_SIZE", 2)
+    (tmp_path / "coedit_counts.tsv").write_text(
+        "user_text\tuser_neighbor\tnum_pages_overlapped\n"
+        "a\tb\t3\n"
+        "a\tc\t1\n"
+        "b\n"
+        "b\ta\t3\n"
+        "b\tc\t1\t1\n"
+    )
+    wsgi.load_coedit_data(tmp_path)
+    rows = db_session.query(Coedit).filter(Coedit.user_text.in_(["a", "b"])).order_by(Coedit.user_text_neighbour)
+    assert [(r.user_text, r.user_text_neighbour, r.overlap_count) for r in rows] == [
+        ("b", "a", 3), ("a", "b", 3), ("a", "c", 1)]
+
+
+@pytest.mark.parametrize("use_arrow", [True, False])
+def test_load_data(db_session, tmp_path, monkeypatch, use_arrow):
+    if not use_arrow:
+        monkeypatch.setattr(wsgi, "pacsv", None)
+    monkeypatch.setattr(wsgi, "LOAD_BATCH_SIZE", 2)
+    (tmp_path / "metadata.tsv").write_text(
+        "user_text\tis_anon\tnum_edits\tnum_pages\tmost_recent_edit\toldest_edit\n"
+        "a\tFalse\t10\t3\t2020-09-21T23:42:39Z\t2020-06-28T17:24:14Z\n"
+        "b\tTrue\t1\t1\t2020-02-04T16:26:02Z\t2020-02-04T16:26:02Z\n"
+        "c\tTrue\n"
+        "d\tTrue\t1\t1\t2020-02-04T16:26:02Z\t2020-02-04T16:26:02Z\n"
+    )
+    (tmp_path / "coedit_counts.tsv").write_text("user_text\tuser_neighbor\tnum_pages_overlapped\na\tb\t1\n")
+    (tmp_path / "temporal.tsv").write_text(
+        "user_text\tday_of_week\thour_of_day\tnum_edits\n"
+        "a\t1\t21\t8\n"
+        "a\t7\t0\t1\n"
+        "b\t2\n"
+    )
+    wsgi.load_data(tmp_path)
+    users = db_session.query(UserMetadata).filter(UserMetadata.user_text.in_(["a", "b", "c", "d"]))
+    assert sorted((u.user_text, u.is_anon, u.num_edits) for u in users) == [
+        ("a", False, 10), ("b", True, 1), ("d", True, 1)]
+    assert db_session.query(UserMetadata).get("a").oldest_edit == datetime(2020, 6, 28, 17, 24, 14)
+    assert db_session.query(UserMetadata).get("a").most_recent_edit == datetime(2020, 9, 21, 23, 42, 39)
+    rows = db_session.query(Temporal).filter(Temporal.user_text.in_(["a", "b"])).order_by(Temporal.d)
+    assert [(r.user_text, r.d, r.h, r.num_edits) for r in rows] == [("a", 0, 21, 8), ("a", 6, 0, 1)]
+
+
+def test_load_data_replaces_rows(db_session, tmp_path):
+    (tmp_path / "metadata.tsv").write_text(
+        "user_text\tis_anon\tnum_edits\tnum_pages\tmost_recent_edit\toldest_edit\n"
+        "a\tFalse\t10\t3\t2020-09-21T23:42:39Z\t2020-06-28T17:24:14Z\n"
+    )
+    (tmp_path / "coedit_counts.tsv").write_text("user_text\tuser_neighbor\tnum_pages_overlapped\na\tb\t1\n")
+    (tmp_path / "temporal.tsv").write_text("user_text\tday_of_week\thour_of_day\tnum_edits\na\t1\t21\t8\n")
+    # Restarting against a persistent database loads the same rows again.
+    wsgi.load_data(tmp_path)
+    wsgi.load_data(tmp_path)
+    assert [u.user_text for u in db_session.query(UserMetadata)] == ["a"]
+    assert db_session.query(Coedit).count() == db_session.query(Temporal).count() == 1
+    assert db_session.query(Dataset).count() == 1
+
+
+def test_load_data_skips_invalid_values(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(wsgi, "pacsv", None)
+    (tmp_path / "metadata.tsv").write_text(
+        "user_text\tis_anon\tnum_edits\tnum_pages\tmost_recent_edit\toldest_edit\n"
+        "a\tmaybe\t1\t1\t2020-02-04T16:26:02Z\t2020-02-04T16:26:02Z\n"
+        "b\tTrue\t1\t1\t2020-02-04T16:26:02Z\t2020-02-04T16:26:02Z\n"
+    )
+    (tmp_path / "coedit_counts.tsv").write_text("user_text\tuser_neighbor\tnum_pages_overlapped\na\tb\tx\n")
+    (tmp_path / "temporal.tsv").write_text("user_text\tday_of_week\thour_of_day\tnum_edits\nb\t2\tx\t1\n")
+    wsgi.load_data(tmp_path)
+    assert [u.user_text for u in db_session.query(UserMetadata).filter(UserMetadata.user_text.in_(["a", "b"]))] == ["b"]
+    assert db_session.query(Temporal).filter_by(user_text="b").count() == 0
+
+
+def test_load_concurrently(app):
+    threads = {}
+
+    def loader(name, fail=False):
+        def load(resourcedir):
+            threads[name] = threading.current_thread().name
+            if fail:
+                raise ValueError(name)
+        return load
+
+    wsgi.load_concurrently("resources", [loader("a"), loader("b")])
+    assert len(set(threads.values())) == 2
+    with pytest.raises(ValueError, match="c"):
+        wsgi.load_concurrently("resources", [loader("a"), loader("c", fail=True), loader("d")])
+    assert {"a", "c", "d"} <= set(threads)
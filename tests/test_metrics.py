@@ -4,4 +4,11 @@ from similar_users.metrics import ExecutionTime
 def test_execution_time():
     with ExecutionTime() as timer:
         pass
-    assert timer.elapsed > 0
\ No newline at end of file
+    assert timer.elapsed > 0
+
+
+def test_execution_time_ns():
+    with ExecutionTime() as timer:
+        pass
+    assert isinstance(timer.elapsed_ns, int)
+    assert timer.elapsed == timer.elapsed_ns / 1e9
@@ -0,0 +1,289 @@
+import numpy as np
+import pytest
+import sys
+
+from datetime import datetime
+from types import MappingProxyType
+
+from similar_users.models import Coedit, Temporal, UserMetadata
+from similar_users.wsgi import (
+    DATASET_CHECK_INTERVAL,
+    DATASET_VERSION,
+    LOOKUP_CACHE,
+    TEMPORAL_DATA,
+    ZERO_VECTORS,
+    LookupResult,
+    get_temporal_overlap,
+    get_temporal_overlaps,
+    get_window_users,
+    get_additional_edits,
+    lookup_user,
+    build_result,
+    build_results,
+    check_dataset_version,
+    update_coedit_data,
+    update_temporal_data,
+    update_temporal_data_from_edits,
+    parse_timestamp,
+    parse_timestamps,
+    set_dataset_version,
+    strtobool,
+    TemporalStore,
+)
+
+
+def cosine_similarity(u, v):
+    u, v = np.asarray(u, dtype=np.float64), np.asarray(v, dtype=np.float64)
+    if not u.any() or not v.any():
+        return 0.0
+    return u @ v / (np.linalg.norm(u) * np.linalg.norm(v))
+
+
+@pytest.fixture
+def temporal_data():
+    data = {
+        "a": {"d": [1, 0, 2, 0, 0, 0, 3], "h": [0] * 23 + [5]},
+        "b": {"d": [2, 1, 0, 0, 0, 0, 1], "h": [0] * 23 + [1]},
+        "c": {"d": [0] * 7, "h": [0] * 24},
+    }
+    TEMPORAL_DATA.clear()
+    for user_text, counts in data.items():
+        TEMPORAL_DATA.add(user_text, counts["d"], counts["h"])
+    yield data
+    TEMPORAL_DATA.clear()
+
+
+@pytest.fixture
+def cached_users():
+    """Cache the metadata of users, as `lookup_user` would: {user_text: num_pages}."""
+    def cache(users):
+        for user_text, num_pages in users.items():
+            LOOKUP_CACHE[user_text] = LookupResult(
+                MappingProxyType({"num_pages": num_pages}), (), ZERO_VECTORS["d"], ZERO_VECTORS["h"]
+            )
+    yield cache
+    LOOKUP_CACHE.clear()
+
+
+def no_temporal_data():
+    return {"d": np.zeros(7), "h": np.zeros(24)}
+
+
+@pytest.mark.parametrize("k", ["d", "h"])
+@pytest.mark.parametrize("u1,u2", [("a", "b"), ("a", "c"), ("a", "missing"), ("c", "c")])
+def test_temporal_overlap(app, temporal_data, u1, u2, k):
+    expected = cosine_similarity(temporal_data.get(u1, {}).get(k, [0]), temporal_data.get(u2, {}).get(k, [0]))
+    assert get_temporal_overlap(u1, u2, k)["cos-sim"] == pytest.approx(expected)
+
+
+def test_temporal_overlap_levels(app, temporal_data):
+    assert get_temporal_overlap("a", "b", "h") == {"cos-sim": pytest.approx(1), "level": "Same"}
+    assert get_temporal_overlap("a", "c", "d") == {"cos-sim": 0, "level": "No overlap"}
+    assert get_temporal_overlap("a", "a", "d") == {"cos-sim": 1.0, "level": "Same"}
+    assert get_temporal_overlap("c", "c", "d") == {"cos-sim": 0.0, "level": "No overlap"}
+    with pytest.raises(Exception):
+        get_temporal_overlap("a", "b", "w")
+
+
+def test_temporal_overlap_after_update(app, temporal_data):
+    temporal = no_temporal_data()
+    update_temporal_data(temporal, 2, 12, 1)
+    assert temporal["d"].tolist() == [0, 0, 3, 0, 0, 0, 0]
+    expected = cosine_similarity(temporal_data["a"]["d"], temporal["d"])
+    assert get_temporal_overlaps("c", ["a"], "d", temporal)[0]["cos-sim"] == pytest.approx(expected)
+    # The cached temporal data of the user is left untouched.
+    assert TEMPORAL_DATA.counts("c", "d") == [0] * 7
+
+
+def test_update_temporal_data_from_edits(app):
+    temporal = no_temporal_data()
+    # Edits are smeared over the previous and next hour, across days of the week.
+    update_temporal_data_from_edits(temporal, [6, 0], [23, 0], [2, 1])
+    assert temporal["d"].tolist() == [4, 0, 0, 0, 0, 0, 5]
+    assert temporal["h"].tolist() == [3, 1] + [0] * 20 + [2, 3]
+    update_temporal_data(temporal, 0, 0, 1)
+    update_temporal_data_from_edits(temporal, [], [])
+    assert temporal["d"].tolist() == [6, 0, 0, 0, 0, 0, 6]
+
+
+@pytest.mark.parametrize("k", ["d", "h"])
+def test_temporal_overlaps(app, temporal_data, k):
+    neighbors = ["b", "c", "missing", "a"]
+    assert get_temporal_overlaps("a", neighbors, k) == [get_temporal_overlap("a", n, k) for n in neighbors]
+    assert get_temporal_overlaps("c", neighbors, k) == [{"cos-sim": 0.0, "level": "No overlap"}] * 4
+    assert get_temporal_overlaps("a", [], k) == []
+    # A request's data of the user, rather than their cached data
+    temporal = {dimension: np.array(counts, dtype=np.float64) for dimension, counts in temporal_data["a"].items()}
+    others = ["b", "c", "missing"]
+    assert get_temporal_overlaps("new", others, k, temporal) == get_temporal_overlaps("a", others, k)
+    assert get_temporal_overlaps("a", neighbors, k, no_temporal_data()) == [
+        {"cos-sim": 0.0, "level": "No overlap"}] * 4
+
+
+@pytest.mark.parametrize("k,expected", [(0, []), (1, ["a"]), (2, ["b", "a", "c", "e"])])
+def test_window_users(k, expected):
+    revs = [{"user": "a"}, {"user": "b"}, {"user": "a"}, {"user": "u"}, {"user": "c"}, {}, {"user": "u"},
+            {"user": "e"}, {"user": "f"}]
+    assert get_window_users(revs, "u", k) == expected
+    assert get_window_users([], "u", k) == []
+
+
+class FakeSession:
+    """Serve canned MediaWiki API responses."""
+    def __init__(self, revisions, bots=(), allrevisions=()):
+        self.revisions = revisions
+        self.bots = bots
+        self.allrevisions = allrevisions
+
+    def get(self, **params):
+        if params.get("list") == "allrevisions":
+            return iter([{"query": {"allrevisions": self.allrevisions}}])
+        if params.get("prop") == "revisions":
+            revs = [{"user": user} for user in self.revisions[params["pageids"]]]
+            return iter([{"query": {"pages": [{"revisions": revs}]}}])
+        users = params["ususers"].split("|")
+        return {"query": {"users": [{"name": u, "groups": ["bot"] if u in self.bots else []} for u in users]}}
+
+
+def test_update_coedit_data(app, cached_users):
+    cached_users({"u": 10, "n1": 5, "n2": 3, "n3": 8})
+    coedits = [("n1", 3), ("n2", 2), ("n3", 1)]
+    session = FakeSession({
+        1: ["n2", "u", "new1", "u", "bot"],
+        2: ["new2", "u", "n3"],
+    }, bots={"bot"})
+    coedits = update_coedit_data("u", coedits, {1: [], 2: []}, 1, session=session, limit=3)
+    # Only the revisions preceding a user's edit by up to k revisions are counted.
+    # Ties are broken by fewer edits from the neighbor. Past the limit, the cut starts
+    # at the first user with a single overlapping page.
+    assert coedits == [("n2", 3), ("n1", 3), ("new1", 1)]
+    assert update_coedit_data("u", coedits, {}, 1, session=session, limit=10) == coedits
+
+
+def test_get_additional_edits(app):
+    metadata = {"num_edits": 1, "num_pages": 1, "oldest_edit": None, "most_recent_edit": None}
+    temporal = no_temporal_data()
+    session = FakeSession({}, allrevisions=[
+        # Sunday 2020-09-27, and Saturday 2020-10-03
+        {"pageid": 1, "revisions": [{"timestamp": "2020-09-27T23:10:00Z"}, {"timestamp": "2020-10-03T00:00:00Z"}]},
+        {"pageid": 2, "revisions": [{"timestamp": "2020-09-28T12:00:00Z"}]},
+    ])
+    pageids = get_additional_edits("u", metadata, temporal, session=session, limit=2)
+    assert pageids == {1: ["2020-09-27T23:10:00Z", "2020-10-03T00:00:00Z"], 2: ["2020-09-28T12:00:00Z"]}
+    assert metadata["num_edits"] == 4
+    assert metadata["oldest_edit"] == datetime(2020, 9, 27, 23, 10)
+    assert metadata["most_recent_edit"] == datetime(2020, 10, 3)
+    # Edits are smeared over the previous and next hour (TEMPORAL_OFFSET).
+    assert temporal["d"].tolist() == [2, 4, 0, 0, 0, 1, 2]
+
+
+def test_lookup_user(db_session):
+    db_session.add_all([
+        UserMetadata(user_text="lookup", is_anon=False, num_edits=10, num_pages=5),
+        Coedit(user_text="lookup", user_text_neighbour="a", overlap_count=2),
+        Coedit(user_text="lookup", user_text_neighbour="b", overlap_count=1),
+        Coedit(user_text="lookup", user_text_neighbour="lookup neighbour", overlap_count=1),
+        Temporal(user_text="lookup", d=0, h=12, num_edits=8),
+        Temporal(user_text="lookup", d=1, h=23, num_edits=1),
+    ])
+    db_session.flush()
+    try:
+        result = lookup_user("lookup")
+        assert result.metadata["num_pages"] == 5
+        assert result.temporal_d.tolist() == [3 * 8, 2, 1, 0, 0, 0, 0] and not result.temporal_d.flags.writeable
+        assert sorted(result.coedits) == [("a", 2), ("b", 1), ("lookup neighbour", 1)]
+        # Neighbour names are interned: all the cached coedit lists share one copy of each.
+        neighbour = next(n for n, _ in result.coedits if n == "lookup neighbour")
+        assert neighbour is sys.intern(" ".join(["lookup", "neighbour"]))
+        # The user's temporal vectors are cached for the requests that have them as a neighbour.
+        assert TEMPORAL_DATA.counts("lookup", "d") == [3 * 8, 2, 1, 0, 0, 0, 0]
+        not_found = lookup_user("not_found")
+        assert not_found.metadata is None and not_found.coedits == ()
+        assert not TEMPORAL_DATA.has_edits("not_found")
+        # Results are read only, and read through LOOKUP_CACHE.
+        with pytest.raises(TypeError):
+            result.metadata["num_pages"] = 6
+        db_session.query(Coedit).filter_by(user_text="lookup").delete()
+        assert lookup_user("lookup") is result
+    finally:
+        TEMPORAL_DATA.clear()
+        LOOKUP_CACHE.clear()
+
+
+def test_check_dataset_version(app, db_session, cached_users):
+    set_dataset_version("previous")
+    DATASET_VERSION.update(version=None, checked=None)
+    try:
+        with app.test_request_context("/similarusers"):
+            check_dataset_version()
+            cached_users({"a": 4})
+            # A stale entry is only cleared once the dataset changed, at most every DATASET_CHECK_INTERVAL.
+            set_dataset_version("refreshed")
+            check_dataset_version()
+            assert "a" in LOOKUP_CACHE
+            DATASET_VERSION["checked"] -= DATASET_CHECK_INTERVAL
+            check_dataset_version()
+            assert "a" not in LOOKUP_CACHE
+            assert DATASET_VERSION["version"] == "refreshed"
+    finally:
+        DATASET_VERSION.update(version=None, checked=None)
+
+
+def test_parse_timestamps():
+    timestamps = ["2020-09-27T23:10:00Z", "2020-10-03T00:00:00Z"]
+    assert parse_timestamps(timestamps).tolist() == [parse_timestamp(ts) for ts in timestamps]
+    for invalid in ("2020-09-27T23:10:00", "2020-09-27T23:10:00+00:00", "2020-09-27"):
+        with pytest.raises(ValueError):
+            parse_timestamps(timestamps + [invalid])
+    for invalid in ("2020-09-27 23:10:00Z", "2020-09-27T23:10:0Z", "2020-09-27T23:10:00+0"):
+        with pytest.raises(ValueError):
+            parse_timestamp(invalid)
+
+
+def test_build_results(app, temporal_data, cached_users):
+    cached_users({"a": 4, "b": 2})
+    results = build_results("a", [("b", 3), ("c", 1)], 10, followup=False)
+    assert [r["user_text"] for r in results] == ["b", "c"]
+    assert [r["num_edits_in_data"] for r in results] == [2, 1]
+    assert [r["edit-overlap"] for r in results] == [0.75, 0.25]
+    assert [r["edit-overlap-inv"] for r in results] == [1, 1]
+    assert results[0] == build_result("a", "b", 3, 10, followup=False)
+    # The request's data of the user, rather than their cached data
+    results = build_results("a", [("b", 3)], 10, False, {"num_pages": 6}, no_temporal_data())
+    assert results[0]["edit-overlap"] == 0.5 and results[0]["day-overlap"]["cos-sim"] == 0.0
+    followup = build_result("a", "b", 3, 10, followup=True)["follow-up"]
+    assert followup["similar"] == "https://spd-test.wmcloud.org/similarusers?usertext=b&k=10"
+    assert "users=a&users=b&" in followup["editorinteract"]
+    assert followup["interaction-timeline"].endswith("user=a&user=b")
+    assert build_results("a", [], 10, followup=False) == []
+
+
+def test_build_results_quotes_user_names(app, cached_users):
+    cached_users({"a b": 4, "c&d": 2})
+    followup = build_result("a b", "c&d", 1, 10, followup=True)["follow-up"]
+    assert followup["similar"].endswith("?usertext=c%26d&k=10")
+    assert "users=a%20b&users=c%26d&" in followup["editorinteract"]
+
+
+@pytest.mark.parametrize("val,expected", [
+    ("True", True), ("1", True), ("yes", True), ("ON", True), ("False", False), ("0", False), ("n", False),
+])
+def test_strtobool(val, expected):
+    assert strtobool(val) is expected
+
+
+def test_temporal_store():
+    store = TemporalStore(maxsize=3, capacity=2)
+    for i in range(4):
+        store.add(f"u{i}", [i] * 7, [1] * 24)
+    # u0 was evicted to make room for u3, and the store grew past its initial capacity
+    assert "u0" not in store and len(store) == 3
+    assert store.counts("u0", "d") == [0] * 7
+    assert store.counts("u3", "d") == [3] * 7
+    store.reset("u1")
+    store.add("u4", [1] * 7, [0] * 24)
+    assert "u2" not in store and "u1" in store
+    assert store.vector("missing", "h") is store.vector("u0", "h")
+    assert not store.vector("missing", "h").any()
+    assert store.vectors(["u1", "u4", "missing"], "d") == pytest.approx(
+        np.array([[0] * 7, [7 ** -0.5] * 7, [0] * 7]))